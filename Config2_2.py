@@ -1,26 +1,36 @@
 import argparse
 import sys
 import os
-import urllib.request
 import json
 
+from Config2_http import ConnectionPool, print_pool_stats, DEFAULT_TIMEOUT, DEFAULT_CONNECT_TIMEOUT, ABBREVIATED_ACCEPT
+from Config2_json import read_latest_dependencies
 
-def get_dependencies_from_registry(package_name, source_url):
+# Общий пул keep-alive соединений для вызовов без явно переданного пула
+registry_pool = ConnectionPool()
+
+
+def get_dependencies_from_registry(package_name, source_url, pool=None, metadata='full', stream=False):
     # Формирование url запроса
     base_url = source_url.rstrip('/')
     url = f"{base_url}/{package_name}"
 
-    with urllib.request.urlopen(url) as response:
-        data = json.loads(response.read())
+    headers = {'Accept': ABBREVIATED_ACCEPT} if metadata == 'abbreviated' else None
+    if stream:
+        # Документ читается только до зависимостей последней версии
+        consume = lambda reader: read_latest_dependencies(reader.read, package_name)
+        return (pool or registry_pool).fetch(url, headers, consume)[2]
 
-        # Получение версии пакета
-        latest_version = data.get('dist-tags', {}).get('latest')
-        if not latest_version:
-            raise ValueError(f"Latest version not found for package {package_name}")
-        # Извлечение зависимостей
-        versions = data.get('versions', {})
-        dependencies = versions[latest_version].get('dependencies', {})
-        return dependencies
+    data = json.loads((pool or registry_pool).request(url, headers))
+
+    # Получение версии пакета
+    latest_version = data.get('dist-tags', {}).get('latest')
+    if not latest_version:
+        raise ValueError(f"Latest version not found for package {package_name}")
+    # Извлечение зависимостей
+    versions = data.get('versions', {})
+    dependencies = versions[latest_version].get('dependencies', {})
+    return dependencies
 
 
 def get_dependencies_from_file(file_path):
@@ -52,6 +62,13 @@ def main():
     parser.add_argument('--source', type=str, required=True)
     parser.add_argument('--test-repo', action='store_true')
     parser.add_argument('--tree', action='store_true')
+    parser.add_argument('--timeout', type=float, default=DEFAULT_TIMEOUT, help='Response timeout in seconds')
+    parser.add_argument('--connect-timeout', type=float, default=DEFAULT_CONNECT_TIMEOUT)
+    parser.add_argument('--pool-stats', action='store_true', help='Print HTTP connection reuse statistics')
+    parser.add_argument('--metadata', choices=('full', 'abbreviated'), default='full',
+                        help='Request full packuments or abbreviated install metadata')
+    parser.add_argument('--stream-json', action='store_true',
+                        help='Read only the latest version dependencies instead of parsing the whole packument')
     args = parser.parse_args()
 
     try:
@@ -65,10 +82,17 @@ def main():
             if not os.path.exists(args.source):
                 raise FileNotFoundError(f"Source file not found: {args.source}")
 
+        if args.timeout <= 0 or args.connect_timeout <= 0:
+            raise ValueError("Timeouts must be positive")
+
         if args.test_repo:
             dependencies = get_dependencies_from_file(args.source)
         else:
-            dependencies = get_dependencies_from_registry(args.package, args.source)
+            with ConnectionPool(args.timeout, args.connect_timeout) as pool:
+                dependencies = get_dependencies_from_registry(args.package, args.source, pool, args.metadata,
+                                                              args.stream_json)
+            if args.pool_stats:
+                print_pool_stats(pool)
 
         if dependencies:
             print("Direct dependencies:")
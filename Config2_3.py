@@ -1,26 +1,97 @@
 import argparse
 import sys
 import os
-import urllib.request
 import json
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 
+from Config2_http import ConnectionPool, print_pool_stats, DEFAULT_TIMEOUT, DEFAULT_CONNECT_TIMEOUT, ABBREVIATED_ACCEPT
+from Config2_json import read_latest_dependencies, read_latest_release, read_all_dependencies
+from Config2_semver import VersionIndex, pick_version
+from Config2_graph import DependencyGraph, GraphBuilder
+from Config2_cache import PackumentCache, CrawlState, print_cache_stats, print_state_stats, CACHE_DIR, CACHE_TTL
+from Config2_export import EXPORT_FORMATS, export_graph
 
-def get_dependencies_from_registry(package_name, source_url):
+DEFAULT_CONCURRENCY = 16
+
+# Общий пул keep-alive соединений для вызовов без явно переданного пула
+registry_pool = ConnectionPool()
+
+
+def extract_dependencies(data, package_name):
+    # Получение версии пакета
+    latest_version = data.get('dist-tags', {}).get('latest')
+    if not latest_version:
+        raise ValueError(f"Latest version not found for package {package_name}")
+    # Извлечение зависимостей
+    versions = data.get('versions', {})
+    return versions[latest_version].get('dependencies', {})
+
+
+def extract_latest_release(data, package_name):
+    # Последняя версия вместе с ее зависимостями, для сохранения состояния обхода
+    latest_version = data.get('dist-tags', {}).get('latest')
+    return {'version': latest_version, 'dependencies': extract_dependencies(data, package_name)}
+
+
+def extract_all_dependencies(data, package_name):
+    # Для разрешения диапазонов нужны метки и зависимости каждой версии
+    versions = data.get('versions', {})
+    return {
+        'dist-tags': data.get('dist-tags', {}),
+        'versions': {version: info.get('dependencies', {}) for version, info in versions.items()},
+    }
+
+
+def fetch_from_registry(package_name, source_url, extract, read, kind, pool=None, cache=None, offline=False,
+                        metadata='full', stream=False):
     # Формирование url запроса
     base_url = source_url.rstrip('/')
     url = f"{base_url}/{package_name}"
 
-    with urllib.request.urlopen(url) as response:
-        data = json.loads(response.read())
+    entry = cache.load(base_url, package_name, kind) if cache else None
+    if entry is not None and (offline or cache.is_fresh(entry)):
+        cache.count('hits')
+        return entry['dependencies']
+    if offline:
+        raise LookupError(f"Package {package_name} is not in the cache (offline mode)")
+
+    headers = cache.conditional_headers(entry) if entry else {}
+    if metadata == 'abbreviated':
+        headers['Accept'] = ABBREVIATED_ACCEPT
+    # В потоковом режиме документ не загружается целиком, из него читается только нужное
+    consume = (lambda reader: read(reader.read, package_name)) if stream else None
+    status, response_headers, body = (pool or registry_pool).fetch(url, headers, consume)
 
-        # Получение версии пакета
-        latest_version = data.get('dist-tags', {}).get('latest')
-        if not latest_version:
-            raise ValueError(f"Latest version not found for package {package_name}")
-        # Извлечение зависимостей
-        versions = data.get('versions', {})
-        dependencies = versions[latest_version].get('dependencies', {})
-        return list(dependencies.keys())
+    if status == 304 and entry is not None:
+        cache.count('revalidated')
+        cache.refresh(entry, response_headers)
+        return entry['dependencies']
+
+    dependencies = body if stream else extract(json.loads(body), package_name)
+    if cache:
+        cache.count('misses')
+        cache.store(base_url, package_name, dependencies, response_headers, kind)
+    return dependencies
+
+
+def get_dependencies_from_registry(package_name, source_url, pool=None, cache=None, offline=False,
+                                   metadata='full', stream=False):
+    dependencies = fetch_from_registry(package_name, source_url, extract_dependencies, read_latest_dependencies,
+                                       'latest', pool, cache, offline, metadata, stream)
+    return list(dependencies)
+
+
+def get_latest_release(package_name, source_url, pool=None, cache=None, offline=False, metadata='full',
+                       stream=False):
+    return fetch_from_registry(package_name, source_url, extract_latest_release, read_latest_release,
+                               'release', pool, cache, offline, metadata, stream)
+
+
+def get_package_versions(package_name, source_url, pool=None, cache=None, offline=False, metadata='full',
+                         stream=False):
+    return fetch_from_registry(package_name, source_url, extract_all_dependencies, read_all_dependencies,
+                               'versions', pool, cache, offline, metadata, stream)
 
 
 def get_dependencies_from_file(file_path):
@@ -46,7 +117,190 @@ def load_test_graph(file_path):
         return json.load(f)
 
 
-def build_dependency_graph_dfs(start_package, source_type, source, visited=None, current_path=None, cycles=None):
+def get_manifest_roots(file_path):
+    # Прямые зависимости проекта: dependencies и devDependencies из package.json
+    # или из корневой записи package-lock.json (lockfileVersion 2 и выше)
+    with open(file_path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    if isinstance(data, dict) and 'lockfileVersion' in data:
+        data = (data.get('packages') or {}).get('')
+        if data is None:
+            raise ValueError(f"Lockfile has no root package entry: {file_path}")
+    if not isinstance(data, dict):
+        raise ValueError(f"Invalid manifest: {file_path}")
+
+    roots = {}
+    for field in ('dependencies', 'devDependencies'):
+        section = data.get(field) or {}
+        if not isinstance(section, dict):
+            raise ValueError(f"Invalid {field} in {file_path}")
+        for name, spec in section.items():
+            roots.setdefault(name, spec)
+    if not roots:
+        raise ValueError(f"No dependencies found in {file_path}")
+    return roots
+
+
+def crawl_registry(start_package, source_url, concurrency=DEFAULT_CONCURRENCY, pool=None, cache=None,
+                   offline=False, metadata='full', stream=False, fetch=None, prefetch=()):
+    # Параллельная загрузка всех достижимых пакетов: зависимости запрашиваются,
+    # как только становятся известны, число одновременных запросов ограничено
+    # размером пула. Ошибка загрузки сохраняется и всплывет при обходе графа.
+    # Пакеты из prefetch запрашиваются сразу, не дожидаясь своих родителей
+    if fetch is None:
+        fetch = partial(get_dependencies_from_registry, source_url=source_url, pool=pool, cache=cache,
+                        offline=offline, metadata=metadata, stream=stream)
+    results = {}
+    seen = {start_package}
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        pending = {executor.submit(fetch, start_package): start_package}
+        for package in prefetch:
+            if package not in seen:
+                seen.add(package)
+                pending[executor.submit(fetch, package)] = package
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                package = pending.pop(future)
+                try:
+                    dependencies = future.result()
+                except Exception as e:
+                    results[package] = e
+                    continue
+                results[package] = dependencies
+                for dep in dependencies:
+                    if dep not in seen:
+                        seen.add(dep)
+                        pending[executor.submit(fetch, dep)] = dep
+
+    return results
+
+
+class PackageVersions:
+    # Версии пакета для разрешения диапазонов: индекс версий строится один раз на пакет
+
+    def __init__(self, package_name, document):
+        self.name = package_name
+        self.tags = document.get('dist-tags') or {}
+        self.versions = document.get('versions') or {}
+        self.index = VersionIndex(self.versions)
+
+    def resolve(self, spec):
+        version = pick_version(self.tags, self.index, spec)
+        if version is None or version not in self.versions:
+            raise LookupError(f"No version of {self.name} matches '{spec}'")
+        return version
+
+
+def split_package_spec(text):
+    # "name@range" -> (name, range); у пакетов с областью имя начинается с '@'
+    name, separator, spec = text[1:].partition('@')
+    return text[0] + name, spec if separator else 'latest'
+
+
+def crawl_resolved(start_package, start_spec, fetch, concurrency=DEFAULT_CONCURRENCY, prefetch=()):
+    roots, results = crawl_resolved_roots([(start_package, start_spec)], fetch, concurrency, prefetch)
+    return roots[0], results
+
+
+def crawl_resolved_roots(specs, fetch, concurrency=DEFAULT_CONCURRENCY, prefetch=()):
+    # Обход с разрешением версий: вершины графа - конкретные "имя@версия".
+    # Документ каждого пакета загружается один раз (fetch в пуле потоков), все
+    # ожидающие его диапазоны разрешаются по индексу версий, когда он приходит.
+    # Неразрешимая зависимость становится вершиной "имя@диапазон" с ошибкой.
+    # Документы пакетов из prefetch запрашиваются сразу. Корни specs - пары
+    # (имя, диапазон), обходятся вместе; возвращаются вершины корней в том же порядке
+    results = {}
+    packages = {}
+    waiting = {}
+    roots = [None] * len(specs)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        pending = {}
+        for name in prefetch:
+            if name not in waiting:
+                waiting[name] = []
+                pending[executor.submit(fetch, name)] = name
+        # (имя пакета, родительская вершина, позиция среди зависимостей родителя, диапазон)
+        ready = [(name, None, position, spec) for position, (name, spec) in enumerate(specs)]
+        while True:
+            while ready:
+                name, parent, position, spec = ready.pop()
+                package = packages.get(name)
+                if package is None:
+                    if name not in waiting:
+                        waiting[name] = []
+                        pending[executor.submit(fetch, name)] = name
+                    waiting[name].append((name, parent, position, spec))
+                    continue
+
+                try:
+                    if isinstance(package, Exception):
+                        raise package
+                    version = package.resolve(spec)
+                    node = f"{name}@{version}"
+                    error = None
+                except Exception as e:
+                    node = f"{name}@{spec}"
+                    error = e
+
+                if parent is None:
+                    roots[position] = node
+                else:
+                    results[parent][position] = node
+                if node in results:
+                    continue
+                if error is not None:
+                    results[node] = error
+                    continue
+
+                dependencies = package.versions[version] or {}
+                results[node] = [None] * len(dependencies)
+                for index, (dep, dep_spec) in enumerate(dependencies.items()):
+                    ready.append((dep, node, index, dep_spec))
+
+            if not pending:
+                break
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = pending.pop(future)
+                try:
+                    packages[name] = PackageVersions(name, future.result())
+                except Exception as e:
+                    packages[name] = e
+                ready.extend(waiting.pop(name))
+
+    return roots, results
+
+
+def crawl_state_nodes(graph, source_url, state, resolve=False):
+    # Вершины графа для сохранения состояния обхода: пакет, разрешенная версия, зависимости
+    nodes = {}
+    for node in graph:
+        if resolve:
+            package, version = split_package_spec(node)
+        else:
+            package = node
+            entry = state.load(source_url, node, 'release')
+            version = entry['dependencies'].get('version') if entry else None
+        nodes[node] = {'package': package, 'version': version, 'dependencies': graph[node]}
+    return nodes
+
+
+def get_dependencies(package, source_type, source):
+    if source_type in ("test_file", "snapshot"):
+        return source.get(package, [])
+    if source_type == "prefetched":
+        dependencies = source[package]
+        if isinstance(dependencies, Exception):
+            raise dependencies
+        return dependencies
+    return get_dependencies_from_registry(package, source)
+
+
+def build_dependency_graph_dfs(start_package, source_type, source, visited=None, current_path=None, cycles=None,
+                               track_cycles=True, log=print):
     if visited is None:
         visited = set()
     if current_path is None:
@@ -54,71 +308,385 @@ def build_dependency_graph_dfs(start_package, source_type, source, visited=None,
     if cycles is None:
         cycles = []
 
-    # Обнаружение циклических зависимостей
-    if start_package in current_path:
-        cycle_start_index = current_path.index(start_package)
-        cycle = current_path[cycle_start_index:] + [start_package]
-        cycle_str = " -> ".join(cycle)
-
-        # Добавляем цикл в список, если его еще нет
-        if cycle_str not in cycles:
-            cycles.append(cycle_str)
-            print(f"Cycle detected: {cycle_str}")
-
-        return {}, cycles
-
-    if start_package in visited:
-        return {}, cycles
-
-    visited.add(start_package)
-    current_path.append(start_package)
-
-    graph = {}
-
-    try:
-        # Получаем зависимости в зависимости от типа источника
-        if source_type == "test_file":
-            dependencies = source.get(start_package, [])
-        else:  # registry
-            dependencies = get_dependencies_from_registry(start_package, source)
-
-        graph[start_package] = dependencies
-
-        # Рекурсивно обходим все зависимости
-        for dep in dependencies:
-            sub_graph, sub_cycles = build_dependency_graph_dfs(dep, source_type, source, visited, current_path.copy(),
-                                                               cycles)
-            graph.update(sub_graph)
-            cycles.extend([c for c in sub_cycles if c not in cycles])
+    # Обход явным стеком итераторов вместо рекурсии: глубина графа не ограничена
+    # пределом рекурсии. Текущий путь один на весь обход, а индекс пакета в нем
+    # хранится в словаре, так что проверка "пакет на пути" занимает O(1)
+    # Несколько корней обходятся по очереди с общим множеством посещенных пакетов
+    roots = [start_package] if isinstance(start_package, str) else list(start_package)
+    path = list(current_path)
+    on_path = {package: index for index, package in enumerate(path)}
+    seen_cycles = set(cycles)
+    graph = GraphBuilder()
+
+    def enter(package):
+        # Возвращает итератор зависимостей, если пакет нужно обойти
+        # Обнаружение циклических зависимостей; без track_cycles циклы
+        # ищутся потом по компонентам сильной связности
+        if package in on_path:
+            if not track_cycles:
+                return None
+            cycle = path[on_path[package]:] + [package]
+            cycle_str = " -> ".join(cycle)
+
+            # Добавляем цикл в список, если его еще нет
+            if cycle_str not in seen_cycles:
+                seen_cycles.add(cycle_str)
+                cycles.append(cycle_str)
+                log(f"Cycle detected: {cycle_str}")
+            return None
+
+        if package in visited:
+            return None
+        visited.add(package)
+
+        try:
+            # Получаем зависимости в зависимости от типа источника
+            dependencies = get_dependencies(package, source_type, source)
+        except Exception as e:
+            log(f"Error processing package {package}: {e}")
+            graph.add(package, [])
+            return None
+
+        graph.add(package, dependencies)
+        on_path[package] = len(path)
+        path.append(package)
+        return iter(dependencies)
+
+    finished = object()
+    stack = []
+    for root in roots:
+        dependencies = enter(root)
+        if dependencies is not None:
+            stack.append(dependencies)
+
+        while stack:
+            dep = next(stack[-1], finished)
+            if dep is finished:
+                # Все зависимости пакета обойдены, он уходит с текущего пути
+                stack.pop()
+                del on_path[path.pop()]
+                continue
+            dependencies = enter(dep)
+            if dependencies is not None:
+                stack.append(dependencies)
+
+    return graph.build(), cycles
+
+
+def find_strongly_connected_components(graph):
+    # Алгоритм Тарьяна без рекурсии, O(V + E), по номерам пакетов графа CSR.
+    # Компоненты возвращаются в обратном топологическом порядке (компонента идет
+    # после всех, достижимых из нее), пакеты внутри компоненты - в порядке обхода,
+    # первым идет корень компоненты
+    offsets = graph.offsets
+    targets = graph.targets
+    count = len(graph)
+    index = [-1] * count
+    lowlink = [0] * count
+    on_stack = bytearray(count)
+    stack = []
+    components = []
+    counter = 0
+
+    for root in range(count):
+        if index[root] >= 0:
+            continue
+        index[root] = lowlink[root] = counter
+        counter += 1
+        stack.append(root)
+        on_stack[root] = 1
+        work = [(root, iter(range(offsets[root], offsets[root + 1])))]
+
+        while work:
+            node, edges = work[-1]
+            for edge in edges:
+                dep = targets[edge]
+                if index[dep] < 0:
+                    index[dep] = lowlink[dep] = counter
+                    counter += 1
+                    stack.append(dep)
+                    on_stack[dep] = 1
+                    work.append((dep, iter(range(offsets[dep], offsets[dep + 1]))))
+                    break
+                if on_stack[dep] and index[dep] < lowlink[node]:
+                    lowlink[node] = index[dep]
+            else:
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    if lowlink[node] < lowlink[parent]:
+                        lowlink[parent] = lowlink[node]
+                if lowlink[node] == index[node]:
+                    component = []
+                    while True:
+                        member = stack.pop()
+                        on_stack[member] = 0
+                        component.append(member)
+                        if member == node:
+                            break
+                    component.reverse()
+                    components.append(component)
+
+    return components
+
+
+def is_cyclic_component(component, graph):
+    return len(component) > 1 or component[0] in graph.successors(component[0])
+
+
+def find_component_cycle(component, graph):
+    # Кратчайший цикл через корень компоненты: поиск в ширину от корня
+    # внутри компоненты до первого ребра, ведущего обратно в корень
+    root = component[0]
+    members = set(component)
+    parents = {root: None}
+    queue = [root]
+    for node in queue:
+        for dep in graph.successors(node):
+            if dep == root:
+                cycle = [root]
+                while node is not None:
+                    cycle.append(node)
+                    node = parents[node]
+                cycle.reverse()
+                return cycle
+            if dep in members and dep not in parents:
+                parents[dep] = node
+                queue.append(dep)
+    return [root]
+
+
+def condense_graph(graph, components):
+    # Граф компонент (DAG): ребра между разными компонентами без повторов
+    component_of = [0] * len(graph)
+    for number, component in enumerate(components):
+        for node in component:
+            component_of[node] = number
+
+    condensed = []
+    for number, component in enumerate(components):
+        targets = {}
+        for node in component:
+            for dep in graph.successors(node):
+                target = component_of[dep]
+                if target != number:
+                    targets[target] = None
+        condensed.append(list(targets))
+    return condensed
+
+
+def print_scc_report(graph):
+    if not isinstance(graph, DependencyGraph):
+        graph = DependencyGraph.from_dict(graph)
+    names = graph.names
+    components = find_strongly_connected_components(graph)
+    condensed = condense_graph(graph, components)
+    # Топологический порядок: зависящие компоненты раньше своих зависимостей
+    order = list(range(len(components) - 1, -1, -1))
+
+    def label(number):
+        component = components[number]
+        if len(component) == 1:
+            return names[component[0]]
+        return "{" + ", ".join(names[node] for node in component) + "}"
+
+    cyclic = [number for number in order if is_cyclic_component(components[number], graph)]
+    if cyclic:
+        print("\nCyclic components found:")
+        for i, number in enumerate(cyclic, 1):
+            component = components[number]
+            cycle = " -> ".join(names[node] for node in find_component_cycle(component, graph))
+            print(f"  Component {i} ({len(component)} packages): {', '.join(names[node] for node in component)}")
+            print(f"    Cycle: {cycle}")
+    else:
+        print("\nNo cyclic dependencies found")
+
+    print("\nCondensed graph:")
+    for number in order:
+        targets = condensed[number]
+        if targets:
+            print(f"{label(number)} -> {', '.join(label(target) for target in targets)}")
+        else:
+            print(f"{label(number)} -> No dependencies")
+
+
+def find_root_reachability(graph, roots):
+    # Для каждого пакета - битовая маска корней, из которых он достижим. Маски
+    # распространяются по сжатому графу компонент в топологическом порядке: каждое
+    # ребро просматривается один раз, работа O((V + E) * число корней / 64)
+    components = find_strongly_connected_components(graph)
+    component_of = [0] * len(graph)
+    for number, component in enumerate(components):
+        for node in component:
+            component_of[node] = number
+
+    masks = [0] * len(components)
+    for bit, root in enumerate(roots):
+        masks[component_of[root]] |= 1 << bit
+    # Компоненты идут после достижимых из них, поэтому обход с конца топологический
+    for number in range(len(components) - 1, -1, -1):
+        mask = masks[number]
+        if not mask:
+            continue
+        for node in components[number]:
+            for target in graph.successors(node):
+                masks[component_of[target]] |= mask
+
+    return [masks[component_of[node]] for node in range(len(graph))]
+
+
+def print_root_reachability(graph, roots):
+    names = graph.names
+    masks = find_root_reachability(graph, roots)
+    everything = (1 << len(roots)) - 1
+
+    print("\nReachability by root:")
+    for bit, root in enumerate(roots):
+        reached = sum(1 for mask in masks if mask >> bit & 1)
+        print(f"  {names[root]}: {reached} of {len(graph)} packages")
+    print(f"  Shared by all roots: {sum(1 for mask in masks if mask == everything)} packages")
+
+    print("\nPackage roots:")
+    for node, package in enumerate(names):
+        mask = masks[node]
+        print(f"{package} <- {', '.join(names[root] for bit, root in enumerate(roots) if mask >> bit & 1)}")
+
+
+def print_dependency_tree(graph, root, max_depth=None, file=None):
+    # ASCII-дерево зависимостей с выводом строк по мере обхода. Поддерево пакета
+    # раскрывается один раз, повторные вхождения пакета с зависимостями помечаются
+    # (deduped), ребро в пакет на текущем пути - (cycle), пакет на границе
+    # глубины, чьи зависимости не показаны, - (...). Память - O(глубина + V)
+    if file is None:
+        file = sys.stdout
+    write = file.write
+    expanded = bytearray(len(graph))
+    on_path = bytearray(len(graph))
+    # Деревья нескольких корней выводятся подряд, общие поддеревья раскрываются один раз
+    for root in ([root] if isinstance(root, int) else root):
+        print_subtree(graph, root, max_depth, write, expanded, on_path)
+
+
+def print_subtree(graph, root, max_depth, write, expanded, on_path):
+    names = graph.names
+    children = graph.successors(root)
+    if expanded[root] and children:
+        write(names[root] + " (deduped)\n")
+        return
+    if children and max_depth is not None and max_depth <= 0:
+        write(names[root] + " (...)\n")
+        return
+    write(names[root] + "\n")
+    expanded[root] = on_path[root] = 1
+    # Кадр стека: пакет, его зависимости, номер следующей зависимости, отступ строк
+    stack = [[root, children, 0, ""]]
+
+    while stack:
+        frame = stack[-1]
+        node, children, index, prefix = frame
+        if index == len(children):
+            stack.pop()
+            on_path[node] = 0
+            continue
+        frame[2] = index + 1
+
+        child = children[index]
+        last = index + 1 == len(children)
+        line = prefix + ("`-- " if last else "|-- ") + names[child]
+        if on_path[child]:
+            write(line + " (cycle)\n")
+            continue
+
+        grandchildren = graph.successors(child)
+        if not grandchildren:
+            write(line + "\n")
+        elif expanded[child]:
+            write(line + " (deduped)\n")
+        elif max_depth is not None and len(stack) >= max_depth:
+            write(line + " (...)\n")
+        else:
+            write(line + "\n")
+            expanded[child] = on_path[child] = 1
+            stack.append([child, grandchildren, 0, prefix + ("    " if last else "|   ")])
 
-    except Exception as e:
-        print(f"Error processing package {start_package}: {e}")
-        graph[start_package] = []
 
-    current_path.pop()
-    return graph, cycles
+def print_dependency_graph(graph):
+    names = graph.names
+    for node, package in enumerate(names):
+        dependencies = graph.successors(node)
+        if dependencies:
+            print(f"{package} -> {', '.join(names[dep] for dep in dependencies)}")
+        else:
+            print(f"{package} -> No dependencies")
 
 
 def main():
     parser = argparse.ArgumentParser()
 
     # Параметры
-    parser.add_argument('--package', type=str, required=True)
-    parser.add_argument('--source', type=str, required=True)
+    parser.add_argument('--package', type=str, help='Package to analyse, several packages are separated by commas')
+    parser.add_argument('--manifest',
+                        help='package.json or package-lock.json whose dependencies and devDependencies are the roots')
+    parser.add_argument('--source', type=str)
     parser.add_argument('--test-repo', action='store_true')
-    parser.add_argument('--tree', action='store_true')
+    parser.add_argument('--tree', action='store_true', help='Print the dependencies as an ASCII tree')
+    parser.add_argument('--depth', type=int, help='Maximum depth of the printed tree or exported graph')
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY)
+    parser.add_argument('--timeout', type=float, default=DEFAULT_TIMEOUT, help='Response timeout in seconds')
+    parser.add_argument('--connect-timeout', type=float, default=DEFAULT_CONNECT_TIMEOUT)
+    parser.add_argument('--pool-stats', action='store_true', help='Print HTTP connection reuse statistics')
+    parser.add_argument('--cache-dir', default=CACHE_DIR, help='Directory of cached registry dependencies')
+    parser.add_argument('--cache-ttl', type=float, default=CACHE_TTL,
+                        help='Seconds a cached package is used without revalidation')
+    parser.add_argument('--no-cache', action='store_true', help='Always download packages from the registry')
+    parser.add_argument('--offline', action='store_true', help='Use only cached packages, never the network')
+    parser.add_argument('--cache-stats', action='store_true', help='Print packument cache statistics')
+    parser.add_argument('--metadata', choices=('full', 'abbreviated'), default='full',
+                        help='Request full packuments or abbreviated install metadata')
+    parser.add_argument('--stream-json', action='store_true',
+                        help='Read only the latest version dependencies instead of parsing whole packuments')
+    parser.add_argument('--scc', action='store_true',
+                        help='Report cycles as strongly connected components with a condensed graph')
+    parser.add_argument('--resolve', action='store_true',
+                        help='Resolve version ranges like npm instead of following the latest versions')
+    parser.add_argument('--load-graph', help='Read dependencies from a graph snapshot instead of --source')
+    parser.add_argument('--save-graph', help='Save the built graph as a binary snapshot')
+    parser.add_argument('--state',
+                        help='Crawl state file for incremental rebuilds: reused if present, updated after the crawl')
+    parser.add_argument('--format', choices=('text',) + EXPORT_FORMATS, default='text',
+                        help='Output format: text report or Graphviz, Mermaid, JSON export')
+    parser.add_argument('--output', help='File for the exported graph (default: standard output)')
+    parser.add_argument('--cluster', action='store_true', help='Group cyclic components in the exported graph')
 
     try:
         args = parser.parse_args()
 
-        if not args.package or not args.package.strip():
-            raise ValueError("Package name cannot be empty")
-
-        if not args.source or not args.source.strip():
+        if args.package is None and not args.manifest:
+            raise ValueError("--package or --manifest is required")
+
+        # Корни обхода: пакеты из --package и прямые зависимости проекта из --manifest
+        root_specs = []
+        if args.package is not None:
+            root_specs = [package.strip() for package in args.package.split(',')]
+            if not all(root_specs):
+                raise ValueError("Package name cannot be empty")
+        if args.manifest:
+            for name, spec in get_manifest_roots(args.manifest).items():
+                root_specs.append(f"{name}@{spec}" if args.resolve else name)
+        root_specs = list(dict.fromkeys(root_specs))
+        roots_key = root_specs[0] if len(root_specs) == 1 else root_specs
+
+        if args.load_graph:
+            if args.source:
+                raise ValueError("--load-graph replaces --source")
+        elif not args.source or not args.source.strip():
             raise ValueError("Source cannot be empty")
 
         # Определяем тип источника и загружаем данные
-        if args.test_repo:
+        if args.load_graph:
+            graph_source = DependencyGraph.load(args.load_graph)
+            source_type = "snapshot"
+        elif args.test_repo:
             if not args.source.startswith(('http://', 'https://')):
                 if not os.path.exists(args.source):
                     raise FileNotFoundError(f"Source file not found: {args.source}")
@@ -138,19 +706,106 @@ def main():
                 graph_source = args.source
                 source_type = "registry"
 
-        # Построение графа зависимостей с помощью DFS с рекурсией
-        dependency_graph, cycles = build_dependency_graph_dfs(args.package, source_type, graph_source)
+        if args.concurrency < 1:
+            raise ValueError("Concurrency must be positive")
+        if args.timeout <= 0 or args.connect_timeout <= 0:
+            raise ValueError("Timeouts must be positive")
+        if args.cache_ttl < 0:
+            raise ValueError("Cache TTL cannot be negative")
+        if args.offline and args.no_cache:
+            raise ValueError("--offline requires the cache")
+        if args.depth is not None and args.depth < 0:
+            raise ValueError("Depth cannot be negative")
+
+        if args.format == 'text' and (args.output or args.cluster):
+            raise ValueError("--output and --cluster require --format dot, mermaid or json")
+
+        if args.resolve and source_type != "registry":
+            raise ValueError("--resolve requires a registry source")
+        if args.state and source_type != "registry":
+            raise ValueError("--state requires a registry source")
+
+        # Пакеты реестра загружаются заранее параллельно, сам обход идет по памяти.
+        # Все корни обходятся вместе: общие зависимости загружаются один раз
+        start_packages = root_specs
+        state = None
+        if source_type == "registry":
+            registry_url = graph_source
+            mode = 'resolve' if args.resolve else 'latest'
+            prefetch = []
+            if args.state:
+                # Состояние прошлого обхода заменяет дисковый кэш: его пакеты перепроверяются
+                # все сразу, тела ответов приходят только для изменившихся
+                state = CrawlState.read(args.state) if os.path.exists(args.state) else CrawlState()
+                prefetch = state.previous_packages(registry_url, roots_key, mode)
+                cache = state
+            else:
+                cache = None if args.no_cache else PackumentCache(args.cache_dir, args.cache_ttl)
+            with ConnectionPool(args.timeout, args.connect_timeout) as pool:
+                if args.resolve:
+                    fetch = partial(get_package_versions, source_url=registry_url, pool=pool, cache=cache,
+                                    offline=args.offline, metadata=args.metadata, stream=args.stream_json)
+                    specs = [split_package_spec(spec) for spec in root_specs]
+                    start_packages, graph_source = crawl_resolved_roots(specs, fetch, args.concurrency, prefetch)
+                    start_packages = list(dict.fromkeys(start_packages))
+                elif state is not None:
+                    # Вместе с зависимостями запоминается последняя версия пакета
+                    release = partial(get_latest_release, source_url=registry_url, pool=pool, cache=cache,
+                                      offline=args.offline, metadata=args.metadata, stream=args.stream_json)
+                    graph_source = crawl_registry(root_specs[0], registry_url, args.concurrency,
+                                                  fetch=lambda package: list(release(package)['dependencies']),
+                                                  prefetch=root_specs[1:] + prefetch)
+                else:
+                    graph_source = crawl_registry(root_specs[0], registry_url, args.concurrency, pool, cache,
+                                                  args.offline, args.metadata, args.stream_json,
+                                                  prefetch=root_specs[1:])
+            source_type = "prefetched"
+            if args.pool_stats:
+                print_pool_stats(pool)
+            if args.cache_stats and state is not None:
+                print_state_stats(state)
+            elif args.cache_stats and cache:
+                print_cache_stats(cache)
+
+        # Построение графа зависимостей обходом в глубину; при экспорте сообщения
+        # идут в stderr, чтобы не смешиваться с выводом, а циклы ищутся по компонентам
+        exporting = args.format != 'text'
+        log = partial(print, file=sys.stderr) if exporting else print
+        dependency_graph, cycles = build_dependency_graph_dfs(start_packages, source_type, graph_source,
+                                                              track_cycles=not (args.scc or exporting), log=log)
+        roots = [dependency_graph.ids[package] for package in start_packages]
+
+        if args.save_graph:
+            dependency_graph.save(args.save_graph)
+        if state is not None:
+            state.save(args.state, registry_url, roots_key, mode,
+                       start_packages[0] if len(start_packages) == 1 else start_packages,
+                       crawl_state_nodes(dependency_graph, registry_url, state, args.resolve))
+
+        # Экспорт пишется в файл по мере обхода графа, без сборки текста в памяти
+        if exporting:
+            components = find_strongly_connected_components(dependency_graph)
+            if args.output:
+                with open(args.output, 'w', encoding='utf-8') as f:
+                    export_graph(dependency_graph, components, args.format, f, roots, args.depth, args.cluster)
+            else:
+                export_graph(dependency_graph, components, args.format, sys.stdout, roots, args.depth, args.cluster)
+            return
 
         # Вывод результатов
-        print("\nDependency graph:")
-        for package, dependencies in dependency_graph.items():
-            if dependencies:
-                print(f"{package} -> {', '.join(dependencies)}")
-            else:
-                print(f"{package} -> No dependencies")
+        if args.tree:
+            print("\nDependency tree:")
+            print_dependency_tree(dependency_graph, roots, args.depth)
+        else:
+            print("\nDependency graph:")
+            print_dependency_graph(dependency_graph)
+        if len(roots) > 1:
+            print_root_reachability(dependency_graph, roots)
 
         # Вывод циклических зависимостей
-        if cycles:
+        if args.scc:
+            print_scc_report(dependency_graph)
+        elif cycles:
             print("\nCyclic dependencies found:")
             for i, cycle in enumerate(cycles, 1):
                 print(f"  Cycle {i}: {cycle}")
@@ -0,0 +1,205 @@
+import os
+import sys
+import json
+import time
+import hashlib
+import tempfile
+import threading
+
+CACHE_DIR = os.environ.get('CONFIG2_CACHE_DIR') or os.path.join(os.path.expanduser('~'), '.cache', 'config2')
+CACHE_TTL = 3600.0
+STATE_FORMAT = 1
+
+
+class PackumentCache:
+    # Кэш зависимостей пакетов реестра на диске: для каждой пары (реестр, пакет)
+    # хранится извлеченный список зависимостей вместе с ETag/Last-Modified ответа.
+    # Вид записи kind отделяет зависимости последней версии ('latest') от
+    # зависимостей всех версий ('versions'), нужных для разрешения диапазонов.
+    # Свежие записи (моложе ttl) отдаются без запроса, устаревшие перепроверяются
+    # условным GET, в автономном режиме используются любые найденные записи
+
+    def __init__(self, directory=CACHE_DIR, ttl=CACHE_TTL):
+        self.directory = directory
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.stats = {'hits': 0, 'revalidated': 0, 'misses': 0}
+
+    def count(self, name):
+        with self.lock:
+            self.stats[name] += 1
+
+    @staticmethod
+    def key_for(source_url, package_name, kind='latest'):
+        text = f"{source_url.rstrip('/')}\0{package_name}"
+        if kind != 'latest':
+            text += f"\0{kind}"
+        return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+    def entry_path(self, key):
+        return os.path.join(self.directory, key + '.json')
+
+    def load(self, source_url, package_name, kind='latest'):
+        try:
+            with open(self.entry_path(self.key_for(source_url, package_name, kind)), 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        # Совпадение хеша без совпадения имени означает чужую или поврежденную запись
+        if entry.get('package') != package_name or entry.get('kind', 'latest') != kind:
+            return None
+        if 'dependencies' not in entry:
+            return None
+        return entry
+
+    def is_fresh(self, entry):
+        return time.time() - entry.get('fetched', 0) < self.ttl
+
+    def store(self, source_url, package_name, dependencies, headers=None, kind='latest'):
+        entry = {
+            'registry': source_url.rstrip('/'),
+            'package': package_name,
+            'kind': kind,
+            'dependencies': dependencies,
+            'etag': headers.get('ETag') if headers else None,
+            'last_modified': headers.get('Last-Modified') if headers else None,
+            'fetched': time.time(),
+        }
+        self.write(self.key_for(source_url, package_name, kind), entry)
+        return entry
+
+    def refresh(self, entry, headers=None):
+        # Ответ 304: содержимое не изменилось, продлевается срок жизни записи
+        if headers:
+            entry['etag'] = headers.get('ETag') or entry.get('etag')
+            entry['last_modified'] = headers.get('Last-Modified') or entry.get('last_modified')
+        entry['fetched'] = time.time()
+        self.write(self.key_for(entry['registry'], entry['package'], entry.get('kind', 'latest')), entry)
+
+    @staticmethod
+    def conditional_headers(entry):
+        headers = {}
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def write(self, key, entry):
+        # Кэш необязателен: ошибки записи не должны прерывать обход графа
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        except OSError:
+            return
+
+        # Атомарная замена: параллельные потоки и процессы не видят недописанных записей
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(entry, f)
+            os.replace(temp_path, self.entry_path(key))
+        except OSError:
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+
+
+class CrawlState(PackumentCache):
+    # Состояние прошлого обхода реестра для инкрементальной пересборки: записи
+    # пакетов в формате PackumentCache и граф, где для каждой вершины указаны пакет,
+    # разрешенная версия и зависимости. Записи хранятся в памяти и никогда не
+    # считаются свежими: каждая перепроверяется условным запросом, ответ 304
+    # оставляет прежнее значение, заново загружаются только изменившиеся пакеты
+
+    def __init__(self, entries=(), registry=None, package=None, mode=None, root=None, nodes=None):
+        super().__init__(directory=None, ttl=0)
+        self.stats.update({'changed': 0, 'new': 0})
+        self.entries = {}
+        for entry in entries:
+            self.entries[self.key_for(entry['registry'], entry['package'], entry.get('kind', 'latest'))] = entry
+        self.registry = registry
+        self.package = package
+        self.mode = mode
+        self.root = root
+        self.nodes = nodes or {}
+
+    def load(self, source_url, package_name, kind='latest'):
+        with self.lock:
+            return self.entries.get(self.key_for(source_url, package_name, kind))
+
+    def is_fresh(self, entry):
+        return False
+
+    def store(self, source_url, package_name, dependencies, headers=None, kind='latest'):
+        key = self.key_for(source_url, package_name, kind)
+        with self.lock:
+            known = key in self.entries
+        self.count('changed' if known else 'new')
+        return super().store(source_url, package_name, dependencies, headers, kind)
+
+    def write(self, key, entry):
+        with self.lock:
+            self.entries[key] = entry
+
+    def previous_packages(self, registry, package, mode):
+        # Пакеты прошлого обхода с тем же корнем: их можно перепроверить сразу,
+        # не дожидаясь, пока обход дойдет до них по зависимостям
+        if (self.registry, self.package, self.mode) != (registry.rstrip('/'), package, mode):
+            return []
+        return list(dict.fromkeys(node['package'] for node in self.nodes.values()))
+
+    def save(self, path, registry, package, mode, root, nodes):
+        # Сохраняются только записи пакетов, попавших в граф
+        packages = {node['package'] for node in nodes.values()}
+        state = {
+            'format': STATE_FORMAT,
+            'registry': registry.rstrip('/'),
+            'package': package,
+            'mode': mode,
+            'root': root,
+            'nodes': nodes,
+            'packages': [entry for entry in self.entries.values() if entry['package'] in packages],
+        }
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(state, f)
+            os.replace(temp_path, path)
+        except BaseException:
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+            raise
+
+    @classmethod
+    def read(cls, path):
+        with open(path, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+        if not isinstance(state, dict) or state.get('format') != STATE_FORMAT:
+            raise ValueError(f"Not a crawl state file: {path}")
+        return cls(state.get('packages', []), state.get('registry'), state.get('package'), state.get('mode'),
+                   state.get('root'), state.get('nodes'))
+
+
+def print_cache_stats(cache, file=None):
+    if file is None:
+        file = sys.stderr
+
+    stats = cache.stats
+    print("Packument cache:", file=file)
+    print(f"  hits: {stats['hits']}", file=file)
+    print(f"  revalidated (304): {stats['revalidated']}", file=file)
+    print(f"  misses: {stats['misses']}", file=file)
+
+
+def print_state_stats(state, file=None):
+    if file is None:
+        file = sys.stderr
+
+    stats = state.stats
+    print("Incremental rebuild:", file=file)
+    print(f"  unchanged (304): {stats['revalidated']}", file=file)
+    print(f"  changed: {stats['changed']}", file=file)
+    print(f"  new: {stats['new']}", file=file)
@@ -0,0 +1,198 @@
+import json
+from array import array
+from collections import deque
+
+from Config2_graph import ids_array
+
+EXPORT_FORMATS = ('dot', 'mermaid', 'json')
+
+
+class GraphExport:
+    # Подготовка к экспорту графа CSR: номер компоненты сильной связности для
+    # каждого пакета (ребро внутри компоненты - циклическое) и, при ограничении
+    # глубины, расстояние от ближайшего корня. Дополнительная память - несколько
+    # массивов по числу пакетов, ребра перебираются прямо из графа без промежуточных списков
+
+    def __init__(self, graph, components, roots=(0,), max_depth=None):
+        self.graph = graph
+        self.roots = list(roots)
+        self.root_set = set(self.roots)
+        self.max_depth = max_depth
+
+        self.component_of = ids_array([0]) * len(graph)
+        self.cyclic_components = bytearray(len(components))
+        for number, component in enumerate(components):
+            for node in component:
+                self.component_of[node] = number
+            if len(component) > 1 or component[0] in graph.successors(component[0]):
+                self.cyclic_components[number] = 1
+        self.components = components
+
+        self.depth = None
+        if max_depth is not None:
+            # Поиск в ширину от корней: в экспорт попадают пакеты не глубже max_depth
+            self.depth = array('i', [-1]) * len(graph)
+            for root in self.roots:
+                self.depth[root] = 0
+            queue = deque(self.roots)
+            while queue:
+                node = queue.popleft()
+                if self.depth[node] == max_depth:
+                    continue
+                for target in graph.successors(node):
+                    if self.depth[target] < 0:
+                        self.depth[target] = self.depth[node] + 1
+                        queue.append(target)
+
+    def included(self, node):
+        return self.depth is None or self.depth[node] >= 0
+
+    def nodes(self):
+        for node in range(len(self.graph)):
+            if self.included(node):
+                yield node
+
+    def edges(self):
+        component_of = self.component_of
+        for node in self.nodes():
+            for target in self.graph.successors(node):
+                if self.included(target):
+                    yield node, target, component_of[node] == component_of[target]
+
+    def truncated(self, node):
+        # Пакет на границе глубины, часть зависимостей которого не попала в экспорт
+        if self.depth is None or self.depth[node] < self.max_depth:
+            return False
+        return any(self.depth[target] < 0 for target in self.graph.successors(node))
+
+    def is_root(self, node):
+        return node in self.root_set
+
+    def in_cycle(self, node):
+        return self.cyclic_components[self.component_of[node]]
+
+    def cycle_groups(self):
+        # Циклические компоненты в виде списков попавших в экспорт пакетов
+        number = 0
+        for component, cyclic in zip(self.components, self.cyclic_components):
+            if not cyclic:
+                continue
+            members = [node for node in component if self.included(node)]
+            if members:
+                number += 1
+                yield number, members
+
+
+def dot_string(text):
+    return '"' + text.replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+
+def write_dot(export, file, cluster=False):
+    names = export.graph.names
+    write = file.write
+
+    def node_line(node, indent):
+        attributes = [f"label={dot_string(names[node])}"]
+        if export.truncated(node):
+            attributes.append("style=dashed")
+        if export.is_root(node):
+            attributes.append("penwidth=2")
+        write(f"{indent}n{node} [{', '.join(attributes)}];\n")
+
+    write("digraph dependencies {\n")
+    write("  node [shape=box];\n")
+    for node in export.nodes():
+        if not (cluster and export.in_cycle(node)):
+            node_line(node, "  ")
+    if cluster:
+        for number, members in export.cycle_groups():
+            write(f"  subgraph cluster_{number} {{\n")
+            write(f"    label={dot_string(f'cycle {number}')};\n")
+            write("    color=red;\n")
+            for node in members:
+                node_line(node, "    ")
+            write("  }\n")
+    for source, target, cyclic in export.edges():
+        write(f"  n{source} -> n{target}{' [color=red]' if cyclic else ''};\n")
+    write("}\n")
+
+
+def mermaid_string(text):
+    return '"' + text.replace('"', '#quot;') + '"'
+
+
+def write_mermaid(export, file, cluster=False):
+    names = export.graph.names
+    write = file.write
+
+    def node_line(node, indent):
+        # Суффикс ::: задает только один класс; усеченный корень (при глубине 0)
+        # получает второй класс отдельной строкой
+        classes = []
+        if export.is_root(node):
+            classes.append("root")
+        if export.truncated(node):
+            classes.append("truncated")
+        suffix = f":::{classes[0]}" if classes else ""
+        write(f"{indent}n{node}[{mermaid_string(names[node])}]{suffix}\n")
+        for name in classes[1:]:
+            write(f"{indent}class n{node} {name}\n")
+
+    write("flowchart LR\n")
+    write("  classDef truncated stroke-dasharray: 5 5\n")
+    write("  classDef root stroke-width: 3px\n")
+    for node in export.nodes():
+        if not (cluster and export.in_cycle(node)):
+            node_line(node, "  ")
+    if cluster:
+        for number, members in export.cycle_groups():
+            write(f"  subgraph cycle{number} [\"cycle {number}\"]\n")
+            for node in members:
+                node_line(node, "    ")
+            write("  end\n")
+    # Стиль ребра задается по его порядковому номеру сразу после него
+    for index, (source, target, cyclic) in enumerate(export.edges()):
+        if cyclic:
+            write(f"  n{source} ==> n{target}\n")
+            write(f"  linkStyle {index} stroke:red\n")
+        else:
+            write(f"  n{source} --> n{target}\n")
+
+
+def write_json(export, file, cluster=False):
+    names = export.graph.names
+    write = file.write
+
+    write('{\n  "root": ' + json.dumps(names[export.roots[0]]) + ',\n')
+    write('  "roots": ' + json.dumps([names[root] for root in export.roots]) + ',\n  "nodes": [')
+    separator = "\n    "
+    for node in export.nodes():
+        item = {"id": node, "name": names[node]}
+        if export.truncated(node):
+            item["truncated"] = True
+        write(separator + json.dumps(item))
+        separator = ",\n    "
+    write('\n  ],\n  "edges": [')
+    separator = "\n    "
+    # Ребра из одних чисел форматируются напрямую, без json.dumps на каждое
+    for source, target, cyclic in export.edges():
+        suffix = ', "cyclic": true}' if cyclic else '}'
+        write(f'{separator}{{"source": {source}, "target": {target}{suffix}')
+        separator = ",\n    "
+    write('\n  ],\n  "cycles": [')
+    separator = "\n    "
+    for number, members in export.cycle_groups():
+        write(separator + json.dumps(members))
+        separator = ",\n    "
+    write('\n  ]\n}\n')
+
+
+WRITERS = {
+    'dot': write_dot,
+    'mermaid': write_mermaid,
+    'json': write_json,
+}
+
+
+def export_graph(graph, components, export_format, file, roots=(0,), max_depth=None, cluster=False):
+    WRITERS[export_format](GraphExport(graph, components, roots, max_depth), file, cluster)
@@ -0,0 +1,168 @@
+import sys
+import struct
+from array import array
+from collections.abc import Mapping
+
+SNAPSHOT_MAGIC = b'C2GRAPH\0'
+SNAPSHOT_VERSION = 1
+SNAPSHOT_HEADER = struct.Struct('<8sIIII')
+
+
+# Номера пакетов хранятся как 32-битные беззнаковые числа
+ID_TYPECODE = 'I' if array('I').itemsize == 4 else 'L'
+
+
+def ids_array(values=()):
+    return array(ID_TYPECODE, values)
+
+
+class DependencyGraph(Mapping):
+    # Граф зависимостей в сжатом виде (CSR): имена пакетов заменены номерами
+    # в порядке обхода, зависимости всех пакетов лежат подряд в массиве targets,
+    # зависимости пакета i занимают targets[offsets[i]:offsets[i + 1]].
+    # Для совместимости граф ведет себя как словарь "имя -> список имен"
+
+    def __init__(self, names, offsets, targets, ids=None):
+        self.names = names
+        self.ids = ids if ids is not None else {name: node for node, name in enumerate(names)}
+        self.offsets = offsets
+        self.targets = targets
+        self.reversed = None
+
+    def __len__(self):
+        return len(self.names)
+
+    def __iter__(self):
+        return iter(self.names)
+
+    def __contains__(self, name):
+        return name in self.ids
+
+    def __getitem__(self, name):
+        names = self.names
+        return [names[target] for target in self.successors(self.ids[name])]
+
+    @property
+    def edge_count(self):
+        return len(self.targets)
+
+    def successors(self, node):
+        return self.targets[self.offsets[node]:self.offsets[node + 1]]
+
+    def predecessors(self, node):
+        return self.reverse().successors(node)
+
+    def reverse(self):
+        # Обратные ребра строятся один раз по запросу подсчетом входящих степеней
+        if self.reversed is None:
+            count = len(self.names)
+            offsets = ids_array([0]) * (count + 1)
+            for target in self.targets:
+                offsets[target + 1] += 1
+            for node in range(count):
+                offsets[node + 1] += offsets[node]
+
+            targets = ids_array([0]) * len(self.targets)
+            position = ids_array(offsets[:count])
+            for node in range(count):
+                for target in self.successors(node):
+                    targets[position[target]] = node
+                    position[target] += 1
+            self.reversed = DependencyGraph(self.names, offsets, targets, self.ids)
+            self.reversed.reversed = self
+        return self.reversed
+
+    @classmethod
+    def from_dict(cls, graph):
+        builder = GraphBuilder()
+        for package, dependencies in graph.items():
+            builder.add(package, dependencies)
+        return builder.build()
+
+    def save(self, path):
+        blob = '\0'.join(self.names).encode('utf-8')
+        if blob.count(b'\0') != max(len(self.names) - 1, 0):
+            raise ValueError("Package names cannot contain NUL characters")
+        offsets, targets = self.offsets, self.targets
+        if sys.byteorder == 'big':
+            offsets, targets = ids_array(offsets), ids_array(targets)
+            offsets.byteswap()
+            targets.byteswap()
+
+        with open(path, 'wb') as f:
+            f.write(SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, len(self.names), len(self.targets),
+                                         len(blob)))
+            f.write(blob)
+            offsets.tofile(f)
+            targets.tofile(f)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as f:
+            header = f.read(SNAPSHOT_HEADER.size)
+            if len(header) != SNAPSHOT_HEADER.size:
+                raise ValueError(f"Not a graph snapshot: {path}")
+            magic, version, count, edges, blob_size = SNAPSHOT_HEADER.unpack(header)
+            if magic != SNAPSHOT_MAGIC:
+                raise ValueError(f"Not a graph snapshot: {path}")
+            if version != SNAPSHOT_VERSION:
+                raise ValueError(f"Unsupported graph snapshot version {version}")
+
+            blob = f.read(blob_size)
+            offsets = ids_array()
+            targets = ids_array()
+            try:
+                offsets.fromfile(f, count + 1)
+                targets.fromfile(f, edges)
+            except EOFError:
+                raise ValueError(f"Truncated graph snapshot: {path}")
+
+        if sys.byteorder == 'big':
+            offsets.byteswap()
+            targets.byteswap()
+        names = blob.decode('utf-8').split('\0') if count else []
+        if len(names) != count or offsets[count] != edges:
+            raise ValueError(f"Corrupted graph snapshot: {path}")
+        return cls(names, offsets, targets)
+
+
+class GraphBuilder:
+    # Накопление графа по мере обхода: номер выдается пакету при первом упоминании,
+    # строки CSR идут в порядке добавления пакетов; build() перенумеровывает
+    # пакеты в этом порядке, упомянутые, но не добавленные пакеты идут в конце
+
+    def __init__(self):
+        self.ids = {}
+        self.names = []
+        self.order = ids_array()
+        self.offsets = ids_array([0])
+        self.targets = ids_array()
+
+    def intern(self, name):
+        node = self.ids.get(name)
+        if node is None:
+            node = self.ids[name] = len(self.names)
+            self.names.append(name)
+        return node
+
+    def add(self, name, dependencies):
+        self.order.append(self.intern(name))
+        self.targets.extend(self.intern(dep) for dep in dependencies)
+        self.offsets.append(len(self.targets))
+
+    def build(self):
+        count = len(self.names)
+        order = self.order
+        offsets = self.offsets
+        if len(order) < count:
+            added = set(order)
+            missing = [node for node in range(count) if node not in added]
+            order.extend(missing)
+            offsets.extend([len(self.targets)] * len(missing))
+
+        rank = ids_array([0]) * count
+        for row, node in enumerate(order):
+            rank[node] = row
+        names = [self.names[node] for node in order]
+        targets = ids_array(rank[target] for target in self.targets)
+        return DependencyGraph(names, offsets, targets)
@@ -0,0 +1,273 @@
+import sys
+import zlib
+import gzip
+import json
+import base64
+import threading
+import http.client
+import urllib.error
+import urllib.request
+from urllib.parse import urlsplit, urljoin, unquote
+
+DEFAULT_TIMEOUT = 30.0
+DEFAULT_CONNECT_TIMEOUT = 10.0
+MAX_IDLE_PER_HOST = 32
+MAX_REDIRECTS = 5
+CHUNK_SIZE = 64 * 1024
+
+# Сокращенные метаданные npm: только поля, нужные для установки пакета
+ABBREVIATED_ACCEPT = 'application/vnd.npm.install-v1+json; q=1.0, application/json; q=0.8, */*'
+
+# Ошибки, по которым видно, что сервер закрыл простаивавшее соединение
+STALE_ERRORS = (http.client.RemoteDisconnected, http.client.BadStatusLine, ConnectionResetError,
+                BrokenPipeError, ConnectionAbortedError)
+
+
+class ConnectionPool:
+    # Пул постоянных HTTP/1.1 соединений: для каждого хоста хранятся свободные
+    # keep-alive соединения, так что TCP/TLS рукопожатие выполняется один раз
+    # на соединение, а не на каждый запрос. Пул можно использовать из нескольких потоков.
+    # Прокси выбираются как в urllib: HTTP(S)_PROXY и NO_PROXY из окружения
+    # (или системные настройки), либо явный словарь proxies вида {'https': url}
+
+    def __init__(self, timeout=DEFAULT_TIMEOUT, connect_timeout=DEFAULT_CONNECT_TIMEOUT,
+                 max_idle_per_host=MAX_IDLE_PER_HOST, proxies=None):
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self.max_idle_per_host = max_idle_per_host
+        self.proxies = urllib.request.getproxies() if proxies is None else proxies
+        self.idle = {}
+        self.lock = threading.Lock()
+        self.stats = {
+            'requests': 0,
+            'connections': 0,
+            'reused': 0,
+            'retried': 0,
+            'bytes_received': 0,
+            'bytes_decoded': 0,
+        }
+
+    def count(self, name, amount=1):
+        with self.lock:
+            self.stats[name] += amount
+
+    def proxy_for(self, parts):
+        # (хост прокси, порт, заголовок Proxy-Authorization) или None для прямого соединения
+        proxy = self.proxies.get(parts.scheme)
+        if not proxy:
+            return None
+        host = parts.hostname if parts.port is None else f"{parts.hostname}:{parts.port}"
+        if urllib.request.proxy_bypass(host):
+            return None
+
+        if '://' not in proxy:
+            proxy = 'http://' + proxy
+        proxy_parts = urlsplit(proxy)
+        authorization = None
+        if proxy_parts.username is not None:
+            credentials = f"{unquote(proxy_parts.username)}:{unquote(proxy_parts.password or '')}"
+            authorization = 'Basic ' + base64.b64encode(credentials.encode('utf-8')).decode('ascii')
+        port = proxy_parts.port or (443 if proxy_parts.scheme == 'https' else 80)
+        return proxy_parts.hostname, port, authorization
+
+    def acquire(self, key):
+        with self.lock:
+            connections = self.idle.get(key)
+            if connections:
+                return connections.pop(), True
+
+        scheme, host, port, proxy = key
+        connection_class = http.client.HTTPSConnection if scheme == 'https' else http.client.HTTPConnection
+        if proxy is None:
+            connection = connection_class(host, port, timeout=self.connect_timeout)
+        else:
+            # HTTPS идет через туннель CONNECT, TLS устанавливается с самим реестром
+            proxy_host, proxy_port, authorization = proxy
+            connection = connection_class(proxy_host, proxy_port, timeout=self.connect_timeout)
+            if scheme == 'https':
+                tunnel_headers = {'Proxy-Authorization': authorization} if authorization else None
+                connection.set_tunnel(host, port, tunnel_headers)
+        connection.connect()
+        # Таймаут подключения и таймаут чтения ответа настраиваются отдельно
+        connection.sock.settimeout(self.timeout)
+        self.count('connections')
+        return connection, False
+
+    def release(self, key, connection):
+        with self.lock:
+            connections = self.idle.setdefault(key, [])
+            if len(connections) < self.max_idle_per_host:
+                connections.append(connection)
+                return
+        connection.close()
+
+    def request(self, url, headers=None):
+        # GET-запрос с поддержкой gzip и перенаправлений, возвращает тело ответа
+        return self.fetch(url, headers)[2]
+
+    def fetch(self, url, headers=None, consume=None):
+        # Возвращает (статус, заголовки, тело); ответ 304 на условный запрос
+        # возвращается как есть с пустым телом, ошибки 4xx/5xx выбрасываются.
+        # Если задан consume, успешный ответ не читается целиком: consume получает
+        # ResponseReader и вместо тела возвращается его результат
+        for _ in range(MAX_REDIRECTS + 1):
+            parts = urlsplit(url)
+            if parts.scheme not in ('http', 'https'):
+                raise ValueError(f"Unsupported URL scheme: {url}")
+            proxy = self.proxy_for(parts)
+            key = (parts.scheme, parts.hostname, parts.port, proxy)
+            path = parts.path or '/'
+            if parts.query:
+                path += '?' + parts.query
+            request_headers = headers
+            if proxy is not None and parts.scheme == 'http':
+                # Через прокси обычный HTTP-запрос передается с абсолютным URI
+                path = f"http://{parts.netloc.rpartition('@')[2]}{path}"
+                if proxy[2]:
+                    request_headers = dict(headers or {})
+                    request_headers['Proxy-Authorization'] = proxy[2]
+
+            status, reason, response_headers, body = self.send(key, path, request_headers, consume)
+
+            if status in (301, 302, 303, 307, 308) and response_headers.get('Location'):
+                url = urljoin(url, response_headers['Location'])
+                continue
+            if status >= 400:
+                raise urllib.error.HTTPError(url, status, reason, response_headers, None)
+
+            if consume is None or status != 200:
+                if response_headers.get('Content-Encoding', '').lower() == 'gzip' and body:
+                    body = gzip.decompress(body)
+                self.count('bytes_decoded', len(body))
+            return status, response_headers, body
+
+        raise urllib.error.HTTPError(url, status, "Too many redirects", response_headers, None)
+
+    def send(self, key, path, extra_headers=None, consume=None):
+        headers = {
+            'Accept': 'application/json',
+            'Accept-Encoding': 'gzip',
+            'Connection': 'keep-alive',
+        }
+        if extra_headers:
+            headers.update(extra_headers)
+        while True:
+            connection, reused = self.acquire(key)
+            try:
+                connection.request('GET', path, headers=headers)
+                response = connection.getresponse()
+                streaming = consume is not None and response.status == 200
+                if not streaming:
+                    body = response.read()
+            except STALE_ERRORS:
+                connection.close()
+                if not reused:
+                    raise
+                # Сервер закрыл соединение, пока оно простаивало в пуле:
+                # повторяем запрос на новом соединении
+                self.count('retried')
+                continue
+            except Exception:
+                connection.close()
+                raise
+            break
+
+        if streaming:
+            reader = ResponseReader(response)
+            try:
+                body = consume(reader)
+            except Exception:
+                connection.close()
+                raise
+            received = reader.received
+            self.count('bytes_decoded', reader.decoded)
+        else:
+            received = len(body)
+
+        with self.lock:
+            self.stats['requests'] += 1
+            self.stats['reused'] += reused
+            self.stats['bytes_received'] += received
+
+        # Недочитанный ответ оставляет соединение в неопределенном состоянии:
+        # дешевле закрыть его, чем дочитывать ненужный остаток документа
+        if response.will_close or not response.isclosed():
+            connection.close()
+        else:
+            self.release(key, connection)
+        return response.status, response.reason, response.headers, body
+
+    def get_json(self, url):
+        return json.loads(self.request(url))
+
+    def close(self):
+        with self.lock:
+            idle, self.idle = self.idle, {}
+        for connections in idle.values():
+            for connection in connections:
+                connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def summary(self):
+        stats = dict(self.stats)
+        requests = stats['requests']
+        # Каждый запрос на повторно использованном соединении - сэкономленное рукопожатие
+        stats['handshakes_saved'] = stats['reused']
+        stats['reuse_rate'] = stats['reused'] / requests if requests else 0.0
+        return stats
+
+
+class ResponseReader:
+    # Файлоподобное чтение тела ответа по частям с распаковкой gzip на лету
+
+    def __init__(self, response):
+        self.response = response
+        self.received = 0
+        self.decoded = 0
+        if response.headers.get('Content-Encoding', '').lower() == 'gzip':
+            self.decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        else:
+            self.decompressor = None
+
+    def read(self, size=CHUNK_SIZE):
+        if self.decompressor is None:
+            data = self.response.read(size)
+            self.received += len(data)
+            self.decoded += len(data)
+            return data
+
+        # Распакованный кусок ограничен size: сжатый ответ может разворачиваться
+        # в десятки раз, а читатель рассчитывает на буфер фиксированного размера
+        while True:
+            data = self.decompressor.unconsumed_tail
+            if not data:
+                data = self.response.read(size)
+                self.received += len(data)
+                if not data:
+                    text = self.decompressor.flush()
+                    self.decoded += len(text)
+                    return text
+            text = self.decompressor.decompress(data, size)
+            if text:
+                self.decoded += len(text)
+                return text
+
+
+def print_pool_stats(pool, file=None):
+    if file is None:
+        file = sys.stderr
+
+    stats = pool.summary()
+    print("HTTP pool:", file=file)
+    print(f"  requests: {stats['requests']}", file=file)
+    print(f"  connections opened: {stats['connections']}", file=file)
+    print(f"  reuse rate: {stats['reuse_rate']:.1%} ({stats['handshakes_saved']} handshakes saved)", file=file)
+    if stats['retried']:
+        print(f"  retried on stale connections: {stats['retried']}", file=file)
+    print(f"  received: {stats['bytes_received'] / 1024:.1f} KiB "
+          f"({stats['bytes_decoded'] / 1024:.1f} KiB decoded)", file=file)
@@ -0,0 +1,208 @@
+import re
+import json
+import codecs
+
+CHUNK_SIZE = 64 * 1024
+
+WHITESPACE_REGEX = re.compile(r'[ \t\n\r]*')
+STRING_PLAIN_REGEX = re.compile(r'[^"\\]*')
+# Пропуск за один вызов всех полных строк и текста между скобками
+SKIP_REGEX = re.compile(r'(?:[^"\[\]{}]+|"[^"\\]*(?:\\.[^"\\]*)*")*', re.DOTALL)
+SCALAR_REGEX = re.compile(r'[^,:\[\]{}\s"]*')
+
+
+class JsonStream:
+    # Потоковое чтение JSON из функции read(size): в памяти держится только
+    # непросмотренный хвост буфера, ненужные значения пропускаются сканированием
+    # без построения объектов, нужные разбираются json.loads по своему фрагменту
+
+    def __init__(self, read, chunk_size=CHUNK_SIZE):
+        self.read = read
+        self.chunk_size = chunk_size
+        self.decoder = codecs.getincrementaldecoder('utf-8')()
+        self.buffer = ''
+        self.pos = 0
+        # Начало значения, которое будет разобрано целиком: до него буфер не обрезается
+        self.mark = None
+        self.eof = False
+        self.consumed = 0
+
+    def fill(self):
+        if self.eof:
+            return False
+        data = self.read(self.chunk_size)
+        if not data:
+            self.eof = True
+        text = self.decoder.decode(data, final=self.eof)
+
+        keep = self.pos if self.mark is None else self.mark
+        self.consumed += keep
+        self.buffer = self.buffer[keep:] + text
+        self.pos -= keep
+        if self.mark is not None:
+            self.mark = 0
+        return bool(data or text)
+
+    def error(self, message):
+        return ValueError(f"{message} at char {self.consumed + self.pos} of JSON document")
+
+    def peek(self):
+        while True:
+            self.pos = WHITESPACE_REGEX.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self.fill():
+                raise self.error("Unexpected end")
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise self.error(f"Expected '{char}'")
+        self.pos += 1
+
+    def skip_string(self):
+        # Позиция стоит на открывающей кавычке
+        self.pos += 1
+        while True:
+            self.pos = STRING_PLAIN_REGEX.match(self.buffer, self.pos).end()
+            if self.pos >= len(self.buffer):
+                if not self.fill():
+                    raise self.error("Unterminated string")
+            elif self.buffer[self.pos] == '"':
+                self.pos += 1
+                return
+            elif self.pos + 1 >= len(self.buffer):
+                # Экранирующий '\' в конце буфера: нужен следующий символ
+                if not self.fill():
+                    raise self.error("Unterminated string")
+            else:
+                self.pos += 2
+
+    def skip_value(self):
+        char = self.peek()
+        if char == '"':
+            self.skip_string()
+            return
+
+        if char not in '{[':
+            start = self.consumed + self.pos
+            while True:
+                self.pos = SCALAR_REGEX.match(self.buffer, self.pos).end()
+                if self.pos < len(self.buffer) or not self.fill():
+                    break
+            if self.consumed + self.pos == start:
+                raise self.error("Expected value")
+            return
+
+        depth = 0
+        while True:
+            self.pos = SKIP_REGEX.match(self.buffer, self.pos).end()
+            if self.pos >= len(self.buffer):
+                if not self.fill():
+                    raise self.error("Unexpected end")
+                continue
+            char = self.buffer[self.pos]
+            if char == '"':
+                # Строка не закончилась в пределах буфера
+                self.skip_string()
+                continue
+            self.pos += 1
+            if char in '{[':
+                depth += 1
+            else:
+                depth -= 1
+                if not depth:
+                    return
+
+    def read_value(self):
+        self.peek()
+        self.mark = self.pos
+        try:
+            self.skip_value()
+            text = self.buffer[self.mark:self.pos]
+        finally:
+            self.mark = None
+        return json.loads(text)
+
+    def keys(self):
+        # Ключи текущего объекта по очереди; после каждого ключа вызывающий код
+        # обязан прочитать или пропустить его значение
+        self.expect('{')
+        if self.peek() == '}':
+            self.pos += 1
+            return
+        while True:
+            if self.peek() != '"':
+                raise self.error("Expected object key")
+            key = self.read_value()
+            self.expect(':')
+            yield key
+            char = self.peek()
+            self.pos += 1
+            if char == '}':
+                return
+            if char != ',':
+                raise self.error("Expected ',' or '}'")
+
+
+def read_version_dependencies(stream):
+    dependencies = {}
+    for key in stream.keys():
+        if key == 'dependencies':
+            dependencies = stream.read_value()
+        else:
+            stream.skip_value()
+    return dependencies
+
+
+def read_latest_release(read, package_name):
+    # Из packument извлекаются только dist-tags.latest и зависимости этой версии.
+    # Обычно dist-tags идут перед versions, и чтение заканчивается сразу после
+    # нужной версии; иначе до появления dist-tags запоминаются зависимости всех версий
+    stream = JsonStream(read)
+    latest = None
+    candidates = {}
+
+    for key in stream.keys():
+        if key == 'dist-tags':
+            tags = stream.read_value()
+            latest = tags.get('latest') if isinstance(tags, dict) else None
+            if not latest:
+                break
+            if latest in candidates:
+                return {'version': latest, 'dependencies': candidates[latest]}
+            candidates.clear()
+        elif key == 'versions':
+            for version in stream.keys():
+                if latest is not None and version != latest:
+                    stream.skip_value()
+                    continue
+                dependencies = read_version_dependencies(stream)
+                if version == latest:
+                    return {'version': latest, 'dependencies': dependencies}
+                candidates[version] = dependencies
+        else:
+            stream.skip_value()
+
+    if not latest:
+        raise ValueError(f"Latest version not found for package {package_name}")
+    raise KeyError(latest)
+
+
+def read_latest_dependencies(read, package_name):
+    return read_latest_release(read, package_name)['dependencies']
+
+
+def read_all_dependencies(read, package_name):
+    # Метки dist-tags и зависимости каждой версии, остальное содержимое пропускается
+    stream = JsonStream(read)
+    tags = {}
+    versions = {}
+    for key in stream.keys():
+        if key == 'dist-tags':
+            tags = stream.read_value()
+        elif key == 'versions':
+            for version in stream.keys():
+                versions[version] = read_version_dependencies(stream)
+        else:
+            stream.skip_value()
+    return {'dist-tags': tags, 'versions': versions}
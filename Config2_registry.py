@@ -0,0 +1,177 @@
+import argparse
+import sys
+import gzip
+import hashlib
+import json
+import time
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import unquote
+
+# Локальная замена реестра npm для проверки Config2_3.py без сети:
+# граф из тестового файла (пакет -> список зависимостей) отдается в виде packument
+
+
+ABBREVIATED_TYPE = 'application/vnd.npm.install-v1+json'
+
+
+def make_packument(name, dependencies, history=0, abbreviated=False):
+    # history - число старых версий с описанием и readme, как у популярных пакетов
+    # реестра; в сокращенных метаданных остаются только поля для установки.
+    # Вместо списка зависимостей можно задать словарь "версия -> {зависимость: диапазон}",
+    # последней (latest) тогда считается последняя версия в словаре
+    if isinstance(dependencies, dict):
+        return make_versioned_packument(name, dependencies, abbreviated)
+
+    versions = {}
+    for minor in range(history):
+        versions[f"0.{minor}.0"] = {
+            "name": name,
+            "version": f"0.{minor}.0",
+            "description": f"Old release {minor} of {name}",
+            "readme": "Lorem ipsum dolor sit amet. " * 40,
+            "dependencies": {dep: f"^0.{minor}.0" for dep in dependencies},
+        }
+    latest = "1.0.0"
+    versions[latest] = {
+        "name": name,
+        "version": latest,
+        "description": f"Package {name}",
+        "readme": "Lorem ipsum dolor sit amet. " * 40,
+        "dependencies": {dep: "^1.0.0" for dep in dependencies},
+    }
+
+    if abbreviated:
+        for version in versions.values():
+            del version["description"], version["readme"]
+        return {"name": name, "dist-tags": {"latest": latest}, "versions": versions}
+
+    return {
+        "name": name,
+        "description": f"Package {name}",
+        "dist-tags": {"latest": latest},
+        "versions": versions,
+        "time": {version: "2020-01-01T00:00:00.000Z" for version in versions},
+        "readme": "Lorem ipsum dolor sit amet. " * 40,
+    }
+
+
+def make_versioned_packument(name, releases, abbreviated=False):
+    versions = {}
+    for version, dependencies in releases.items():
+        versions[version] = {"name": name, "version": version, "dependencies": dependencies}
+        if not abbreviated:
+            versions[version]["description"] = f"Package {name} {version}"
+    latest = list(releases)[-1] if releases else None
+    packument = {"name": name, "dist-tags": {"latest": latest} if latest else {}, "versions": versions}
+    if not abbreviated:
+        packument["time"] = {version: "2020-01-01T00:00:00.000Z" for version in versions}
+    return packument
+
+
+class RegistryHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.request_count += 1
+        if server.latency:
+            time.sleep(server.latency)
+
+        name = unquote(self.path.lstrip('/'))
+        if name not in server.graph:
+            self.send_payload(404, {"error": "Not found"})
+            return
+        abbreviated = ABBREVIATED_TYPE in self.headers.get('Accept', '')
+        packument = make_packument(name, server.graph[name], server.history, abbreviated)
+        self.send_payload(200, packument, ABBREVIATED_TYPE if abbreviated else 'application/json')
+
+    def send_payload(self, status, payload, content_type='application/json'):
+        body = json.dumps(payload).encode('utf-8')
+        etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+        if status == 200 and self.headers.get('If-None-Match') == etag:
+            with self.server.lock:
+                self.server.not_modified_count += 1
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        if status == 200:
+            self.send_header('ETag', etag)
+        if 'gzip' in self.headers.get('Accept-Encoding', ''):
+            body = gzip.compress(body)
+            self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+class RegistryServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, graph, latency=0.0, verbose=False, history=0):
+        super().__init__(address, RegistryHandler)
+        self.graph = graph
+        self.latency = latency
+        self.history = history
+        self.verbose = verbose
+        self.lock = threading.Lock()
+        self.request_count = 0
+        self.connection_count = 0
+        self.not_modified_count = 0
+
+    def process_request(self, request, client_address):
+        with self.lock:
+            self.connection_count += 1
+        super().process_request(request, client_address)
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+
+def serve_registry(graph, port=0, latency=0.0, history=0):
+    # Запуск в фоновом потоке, для использования из скриптов и замеров
+    server = RegistryServer(('127.0.0.1', port), graph, latency, history=history)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve a test dependency graph as a local npm-like registry')
+    parser.add_argument('graph_file', help='JSON file mapping package names to dependency lists')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--latency', type=float, default=0.0, help='Delay before each response in seconds')
+    parser.add_argument('--history', type=int, default=0, help='Old versions published for every package')
+    parser.add_argument('--verbose', action='store_true')
+    args = parser.parse_args()
+
+    try:
+        with open(args.graph_file, 'r', encoding='utf-8') as f:
+            graph = json.load(f)
+
+        server = RegistryServer(('127.0.0.1', args.port), graph, args.latency, args.verbose, args.history)
+        print(f"Serving {len(graph)} packages at {server.url}")
+        server.serve_forever()
+
+    except KeyboardInterrupt:
+        pass
+    except Exception as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
+
+#python Config2_registry.py test2.txt --port 8000
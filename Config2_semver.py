@@ -0,0 +1,254 @@
+import re
+from bisect import bisect_left, bisect_right
+from functools import lru_cache
+
+# Разбор версий и диапазонов в духе node-semver: ^, ~, x/*, частичные версии,
+# диапазоны через дефис и '||'. Версия превращается в ключ-кортеж, сравнение
+# ключей совпадает с порядком semver, а каждый набор компараторов диапазона
+# сводится к одному интервалу ключей
+
+VERSION_REGEX = re.compile(r'^[v=]*(\d+)\.(\d+)\.(\d+)(?:-([0-9A-Za-z.-]+))?(?:\+[0-9A-Za-z.-]+)?$')
+PARTIAL_REGEX = re.compile(
+    r'^[v=]*(\d+|[xX*])(?:\.(\d+|[xX*])(?:\.(\d+|[xX*])(?:-([0-9A-Za-z.-]+))?(?:\+[0-9A-Za-z.-]+)?)?)?$')
+OPERATOR_REGEX = re.compile(r'^(<=|>=|<|>|=|\^|~>|~)?(.*)$')
+OPERATOR_SPACE_REGEX = re.compile(r'(<=|>=|<|>|=|\^|~>|~)\s+')
+HYPHEN_REGEX = re.compile(r'^(\S+)\s+-\s+(\S+)$')
+
+RANGE_CACHE_SIZE = 1 << 16
+
+
+def prerelease_key(text):
+    # Числовые идентификаторы меньше буквенных и сравниваются как числа
+    return tuple((0, int(part)) if part.isdigit() else (1, part) for part in text.split('.'))
+
+
+def make_key(major, minor, patch, prerelease=None):
+    # Релиз старше любого своего пре-релиза: 1 против 0 в четвертой позиции
+    if prerelease is None:
+        return (major, minor, patch, 1)
+    return (major, minor, patch, 0) + prerelease_key(prerelease)
+
+
+def lowest_key(major, minor, patch):
+    # Ключ X.Y.Z-0, меньше него у этой тройки ничего нет
+    return (major, minor, patch, 0, (0, 0))
+
+
+@lru_cache(maxsize=RANGE_CACHE_SIZE)
+def parse_version(text):
+    match = VERSION_REGEX.match(text.strip())
+    if match is None:
+        return None
+    major, minor, patch, prerelease = match.groups()
+    return make_key(int(major), int(minor), int(patch), prerelease)
+
+
+def parse_partial(text, range_text):
+    match = PARTIAL_REGEX.match(text)
+    if match is None:
+        raise ValueError(f"Invalid version range: {range_text}")
+    major, minor, patch, prerelease = match.groups()
+    parts = []
+    for part in (major, minor, patch):
+        parts.append(None if part is None or part in 'xX*' else int(part))
+    # Части после x тоже считаются x: 1.x.3 означает 1.x
+    for i in range(1, 3):
+        if parts[i - 1] is None:
+            parts[i] = None
+    if parts[2] is None:
+        prerelease = None
+    return parts[0], parts[1], parts[2], prerelease
+
+
+def desugar(operator, partial):
+    # Компаратор -> список простых условий (операция, ключ); None - ничего не подходит
+    major, minor, patch, prerelease = partial
+    if major is None:
+        return None if operator in ('<', '>') else []
+
+    if operator in ('', '='):
+        if minor is None:
+            return [('>=', make_key(major, 0, 0)), ('<', lowest_key(major + 1, 0, 0))]
+        if patch is None:
+            return [('>=', make_key(major, minor, 0)), ('<', lowest_key(major, minor + 1, 0))]
+        key = make_key(major, minor, patch, prerelease)
+        return [('>=', key), ('<=', key)]
+
+    if operator == '>':
+        if minor is None:
+            return [('>=', make_key(major + 1, 0, 0))]
+        if patch is None:
+            return [('>=', make_key(major, minor + 1, 0))]
+        return [('>', make_key(major, minor, patch, prerelease))]
+
+    if operator == '>=':
+        return [('>=', make_key(major, minor or 0, patch or 0, prerelease))]
+
+    if operator == '<':
+        if minor is None:
+            return [('<', lowest_key(major, 0, 0))]
+        if patch is None:
+            return [('<', lowest_key(major, minor, 0))]
+        return [('<', make_key(major, minor, patch, prerelease))]
+
+    if operator == '<=':
+        if minor is None:
+            return [('<', lowest_key(major + 1, 0, 0))]
+        if patch is None:
+            return [('<', lowest_key(major, minor + 1, 0))]
+        return [('<=', make_key(major, minor, patch, prerelease))]
+
+    lower = ('>=', make_key(major, minor or 0, patch or 0, prerelease))
+    if operator in ('~', '~>'):
+        if minor is None:
+            return [lower, ('<', lowest_key(major + 1, 0, 0))]
+        return [lower, ('<', lowest_key(major, minor + 1, 0))]
+
+    # '^': не меняется самая левая ненулевая часть версии
+    if major or minor is None:
+        return [lower, ('<', lowest_key(major + 1, 0, 0))]
+    if minor or patch is None:
+        return [lower, ('<', lowest_key(0, minor + 1, 0))]
+    return [lower, ('<', lowest_key(0, 0, patch + 1))]
+
+
+def desugar_hyphen(first, last):
+    conditions = []
+    if first[0] is not None:
+        conditions.append(('>=', make_key(first[0], first[1] or 0, first[2] or 0, first[3])))
+    major, minor, patch, prerelease = last
+    if major is not None:
+        if minor is None:
+            conditions.append(('<', lowest_key(major + 1, 0, 0)))
+        elif patch is None:
+            conditions.append(('<', lowest_key(major, minor + 1, 0)))
+        else:
+            conditions.append(('<=', make_key(major, minor, patch, prerelease)))
+    return conditions
+
+
+def make_interval(conditions, prereleases):
+    # Пересечение условий набора: (нижний ключ, включительно, верхний ключ,
+    # включительно, тройки версий, чьи пре-релизы допустимы) или None, если пусто
+    low, low_inclusive, high, high_inclusive = None, True, None, True
+    for operator, key in conditions:
+        if operator == '>=':
+            if low is None or key > low:
+                low, low_inclusive = key, True
+        elif operator == '>':
+            if low is None or key >= low:
+                low, low_inclusive = key, False
+        elif operator == '<=':
+            if high is None or key < high:
+                high, high_inclusive = key, True
+        elif high is None or key <= high:
+            high, high_inclusive = key, False
+
+    if low is not None and high is not None:
+        if low > high or (low == high and not (low_inclusive and high_inclusive)):
+            return None
+    return low, low_inclusive, high, high_inclusive, frozenset(prereleases)
+
+
+@lru_cache(maxsize=RANGE_CACHE_SIZE)
+def parse_range(text):
+    intervals = []
+    for part in text.split('||'):
+        part = OPERATOR_SPACE_REGEX.sub(r'\1', part.strip())
+        conditions = []
+        prereleases = []
+        hyphen = HYPHEN_REGEX.match(part)
+        if hyphen:
+            first = parse_partial(hyphen.group(1), text)
+            last = parse_partial(hyphen.group(2), text)
+            conditions = desugar_hyphen(first, last)
+            prereleases = [partial[:3] for partial in (first, last) if partial[3]]
+        else:
+            for comparator in part.split():
+                operator, version = OPERATOR_REGEX.match(comparator).groups()
+                partial = parse_partial(version, text)
+                if partial[3]:
+                    prereleases.append(partial[:3])
+                desugared = desugar(operator or '', partial)
+                if desugared is None:
+                    conditions = None
+                    break
+                conditions.extend(desugared)
+        if conditions is None:
+            continue
+        interval = make_interval(conditions, prereleases)
+        if interval is not None:
+            intervals.append(interval)
+    return tuple(intervals)
+
+
+def key_in_interval(key, interval):
+    low, low_inclusive, high, high_inclusive, prereleases = interval
+    if low is not None and (key < low or (key == low and not low_inclusive)):
+        return False
+    if high is not None and (key > high or (key == high and not high_inclusive)):
+        return False
+    # Пре-релизы подходят, только если в наборе явно упомянут пре-релиз той же тройки
+    return len(key) == 4 or key[:3] in prereleases
+
+
+def satisfies(version, range_text):
+    key = parse_version(version)
+    if key is None:
+        return False
+    return any(key_in_interval(key, interval) for interval in parse_range(range_text))
+
+
+class VersionIndex:
+    # Версии пакета, отсортированные по ключу: самая старшая подходящая версия
+    # ищется двоичным поиском по верхней границе интервала, результаты запоминаются
+
+    def __init__(self, versions):
+        parsed = []
+        for text in versions:
+            key = parse_version(text)
+            if key is not None:
+                parsed.append((key, text))
+        parsed.sort()
+        self.keys = [key for key, _ in parsed]
+        self.texts = [text for _, text in parsed]
+        self.memo = {}
+
+    def max_satisfying(self, range_text):
+        if range_text in self.memo:
+            return self.memo[range_text]
+
+        keys = self.keys
+        best = -1
+        for interval in parse_range(range_text):
+            low, low_inclusive, high, high_inclusive, prereleases = interval
+            if high is None:
+                position = len(keys)
+            elif high_inclusive:
+                position = bisect_right(keys, high)
+            else:
+                position = bisect_left(keys, high)
+            # Вниз от границы до первой подходящей версии: пропускаются только пре-релизы
+            for position in range(position - 1, best, -1):
+                key = keys[position]
+                if low is not None and (key < low or (key == low and not low_inclusive)):
+                    break
+                if len(key) == 4 or key[:3] in prereleases:
+                    best = position
+                    break
+
+        result = self.texts[best] if best >= 0 else None
+        self.memo[range_text] = result
+        return result
+
+
+def pick_version(tags, index, spec):
+    # Выбор версии как в npm: имя метки (latest, next) указывает версию напрямую;
+    # для диапазона предпочитается latest, если он подходит, иначе старшая подходящая
+    spec = spec.strip() or '*'
+    if spec in tags:
+        return tags[spec]
+    latest = tags.get('latest')
+    if latest and satisfies(latest, spec):
+        return latest
+    return index.max_satisfying(spec)
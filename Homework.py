@@ -1,139 +1,1025 @@
+import io
+import os
 import sys
 import re
+import glob
+import mmap
+import time
+import bisect
+import struct
+import shutil
+import hashlib
+import cProfile
 import argparse
-from typing import Dict, Any, Union
+import tempfile
+import tracemalloc
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from itertools import chain
+from typing import Dict, Any, Iterable, Tuple, Union
+
+VERSION = '1.1'
 
 Value = Union[int, float, str, Dict[str, Any], bool]
 
+CHUNK_SIZE = 64 * 1024
+
+END_TOKEN = (None, None)
+
+WRITE_BATCH = 1024
+
+PARALLEL_CHUNK = 256 * 1024
+
+CACHE_DIR = os.environ.get('HOMEWORK_CACHE_DIR') or os.path.join(os.path.expanduser('~'), '.cache', 'homework')
+
+CACHE_LIMIT = 64 * 1024 * 1024
+
+WATCH_INTERVAL = 0.025
+
+
+class TokenArray:
+    # Токены хранятся параллельными массивами кодов и смещений в исходном тексте:
+    # около 9 байт на токен вместо кортежа и отдельной строки. Текст токена
+    # вырезается только при обходе
+    __slots__ = ('text', 'tags', 'codes', 'starts', 'ends')
+
+    def __init__(self, text: str, tags):
+        offset_type = 'I' if len(text) < 2 ** 32 else 'Q'
+        self.text = text
+        self.tags = tags
+        self.codes = array('B')
+        self.starts = array(offset_type)
+        self.ends = array(offset_type)
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __getitem__(self, index: int) -> Tuple[str, str]:
+        return self.tags[self.codes[index]], self.text[self.starts[index]:self.ends[index]]
+
+    def __iter__(self):
+        return zip(map(self.tags.__getitem__, self.codes),
+                   map(self.text.__getitem__, map(slice, self.starts, self.ends)))
+
+
+class TextScanner:
+    # Токенизация по требованию с явной позицией в тексте: позволяет
+    # перескакивать через участки текста, не разбивая их на токены.
+    # count - число выданных токенов для статистики
+    __slots__ = ('parser', 'text', 'pos', 'count')
+
+    def __init__(self, parser, text: str, pos: int = 0):
+        self.parser = parser
+        self.text = text
+        self.pos = pos
+        self.count = 0
+
+    def take(self) -> Tuple[str, str]:
+        parser = self.parser
+        match = parser.TOKEN_REGEX.match(self.text, self.pos)
+        self.pos = match.end()
+        index = match.lastindex
+        if index is None:
+            return END_TOKEN
+        tag = parser.TOKEN_TAGS[index]
+        if tag == 'MISMATCH':
+            start = match.start(index)
+            raise parser.unexpected_char(self.text[start], start, *parser.error_position(self.text, start))
+        self.count += 1
+        return tag, match.group(index)
+
 
 class ConfigParser:
+    TOKEN_PATTERNS = [
+        (r'\d+(?:\.\d*)?|\.\d+', 'NUMBER'),
+        (r'"[^"]*"', 'STRING'),
+        (r'\{', 'LBRACE'),
+        (r'\}', 'RBRACE'),
+        (r'->', 'ARROW'),
+        (r'<-', 'ASSIGN'),
+        (r'\[', 'LBRACKET'),
+        (r'\]', 'RBRACKET'),
+        (r'\.', 'DOT'),
+        (r';', 'SEMICOLON'),
+        (r'true|false', 'BOOLEAN'),
+        (r'[_a-zA-Z]+', 'IDENT'),
+    ]
+
+    # Пробелы и комментарии не порождают токенов, поэтому пропускаются префиксом
+    # перед каждым токеном. Альтернативы проверяются в том же порядке, что и в
+    # списке, последняя группа ловит любой неожиданный символ
+    TOKEN_REGEX = re.compile(
+        r'(?:\s+|#.*)*(?:'
+        + '|'.join(f'({pattern})' for pattern, _ in TOKEN_PATTERNS)
+        + r'|((?s:.))|\Z)'
+    )
+
+    TOKEN_TAGS = (None,) + tuple(tag for _, tag in TOKEN_PATTERNS) + ('MISMATCH',)
+
+    # Для пропуска поддерева важны только фигурные скобки вне строк и комментариев,
+    # для разбиения корня еще и точка, за которой начинается следующая запись
+    SKIP_REGEX = re.compile(r'[{}"#]')
+    CUT_REGEX = re.compile(r'[{}"#]|\.(?=\s*[_a-zA-Z]+\s*->)')
+
     def __init__(self):
         self.constants: Dict[str, Value] = {}
+        self.stats: Dict[str, Any] = {'phases': {}, 'tokens': 0, 'max_depth': 0}
 
-    def tokenize(self, text: str):
-        patterns = [
-            (r'\d+(?:\.\d*)?|\.\d+', 'NUMBER'),
-            (r'"[^"]*"', 'STRING'),
-            (r'\{', 'LBRACE'),
-            (r'\}', 'RBRACE'),
-            (r'->', 'ARROW'),
-            (r'<-', 'ASSIGN'),
-            (r'\[', 'LBRACKET'),
-            (r'\]', 'RBRACKET'),
-            (r'\.', 'DOT'),
-            (r';', 'SEMICOLON'),
-            (r'true|false', 'BOOLEAN'),
-            (r'[_a-zA-Z]+', 'IDENT'),
-            (r'#.*', 'COMMENT'),
-            (r'\s+', 'SPACE'),
-        ]
-
-        tokens = []
-        pos = 0
-
-        while pos < len(text):
-            match = None
-            for pattern, tag in patterns:
-                regex = re.compile(pattern)
-                match = regex.match(text, pos)
-                if match:
-                    if tag != 'SPACE' and tag != 'COMMENT':
-                        tokens.append((tag, match.group()))
-                    pos = match.end()
-                    break
-            if not match:
-                raise SyntaxError(f"Unexpected char at {pos}: {text[pos]}")
+    @staticmethod
+    def start_phase() -> float:
+        if tracemalloc.is_tracing():
+            tracemalloc.reset_peak()
+        return time.perf_counter()
 
+    def end_phase(self, name: str, started: float):
+        phase = {'seconds': time.perf_counter() - started}
+        if tracemalloc.is_tracing():
+            phase['peak_bytes'] = tracemalloc.get_traced_memory()[1]
+        self.stats['phases'][name] = phase
+
+    @staticmethod
+    def error_position(text: str, pos: int):
+        line = text.count('\n', 0, pos) + 1
+        column = pos - text.rfind('\n', 0, pos)
+        return line, column
+
+    @staticmethod
+    def unexpected_char(char: str, pos: int, line: int, column: int) -> SyntaxError:
+        return SyntaxError(f"Unexpected char at {pos} (line {line}, column {column}): {char}")
+
+    def tokenize(self, text: str) -> TokenArray:
+        started = self.start_phase()
+        tags = self.TOKEN_TAGS
+        mismatch = len(tags) - 1
+        tokens = TokenArray(text, tags)
+        add_code = tokens.codes.append
+        add_start = tokens.starts.append
+        add_end = tokens.ends.append
+
+        for match in self.TOKEN_REGEX.finditer(text):
+            index = match.lastindex
+            if index is None:
+                continue
+            if index == mismatch:
+                pos = match.start(index)
+                raise self.unexpected_char(text[pos], pos, *self.error_position(text, pos))
+            add_code(index)
+            add_start(match.start(index))
+            add_end(match.end(index))
+
+        self.stats['tokens'] = len(tokens)
+        self.end_phase('tokenize', started)
         return tokens
 
+    def stream_tokens(self, stream, chunk_size: int = CHUNK_SIZE):
+        # read(0) возвращает пустую строку, которую цикл принял бы за конец файла
+        if chunk_size < 1:
+            raise ValueError(f"Chunk size must be positive: {chunk_size}")
+        regex = self.TOKEN_REGEX
+        tags = self.TOKEN_TAGS
+        mismatch = len(tags) - 1
+
+        buffer = ''
+        offset = 0
+        line = 1
+        line_start = 0
+        eof = False
+        count = 0
+
+        while not eof:
+            # Незавершенный хвост буфера может быть длиннее блока (длинная строка),
+            # поэтому читаем не меньше его длины, чтобы не пересканировать его квадратично
+            chunk = stream.read(max(chunk_size, len(buffer)))
+            eof = not chunk
+            buffer += chunk
+            consumed = 0
+
+            for match in regex.finditer(buffer):
+                index = match.lastindex
+                # Токен, упершийся в конец блока, или открывающая кавычка без пары
+                # могут продолжиться в следующем блоке
+                if not eof and (match.end() == len(buffer)
+                                or index == mismatch and buffer[match.start(index)] == '"'):
+                    consumed = match.start()
+                    break
+                consumed = match.end()
+                if index is None:
+                    continue
+                if index == mismatch:
+                    pos = match.start(index)
+                    last_newline = buffer.rfind('\n', 0, pos)
+                    column = pos - last_newline if last_newline >= 0 else offset + pos - line_start + 1
+                    raise self.unexpected_char(buffer[pos], offset + pos, line + buffer.count('\n', 0, pos), column)
+                count += 1
+                yield tags[index], match.group(index)
+
+            self.stats['tokens'] = count
+            newlines = buffer.count('\n', 0, consumed)
+            if newlines:
+                line += newlines
+                line_start = offset + buffer.rfind('\n', 0, consumed) + 1
+            offset += consumed
+            buffer = buffer[consumed:]
+
     def parse(self, text: str) -> Dict[str, Any]:
-        tokens = self.tokenize(text)
-        self.pos = 0
-
-        def peek():
-            return tokens[self.pos] if self.pos < len(tokens) else None
-
-        def consume(tag=None):
-            token = tokens[self.pos]
-            self.pos += 1
-            if tag and token[0] != tag:
-                raise SyntaxError(f"Expected {tag}, got {token[0]}")
-            return token
-
-        def parse_value():
-            token = peek()
-            if not token:
-                return None
-
-            if token[0] == 'NUMBER':
-                consume('NUMBER')
-                return float(token[1]) if '.' in token[1] else int(token[1])
-            elif token[0] == 'STRING':
-                consume('STRING')
-                return token[1][1:-1]
-            elif token[0] == 'BOOLEAN':
-                consume('BOOLEAN')
-                return token[1] == 'true'
-            elif token[0] == 'LBRACKET':
-                consume('LBRACKET')
-                const_name = consume('IDENT')[1]
-                consume('RBRACKET')
-                if const_name not in self.constants:
-                    raise NameError(f"Undefined constant: {const_name}")
-                return self.constants[const_name]
-            elif token[0] == 'LBRACE':
-                return parse_dict()
-            elif token[0] == 'IDENT':
-                const_name = token[1]
-                if const_name in self.constants:
-                    consume('IDENT')
-                    return self.constants[const_name]
-                else:
-                    raise SyntaxError(f"Unexpected identifier: {const_name}")
+        return self.parse_tokens(self.tokenize(text))
+
+    def parse_stream(self, stream, chunk_size: int = CHUNK_SIZE) -> Dict[str, Any]:
+        if chunk_size < 1:
+            raise ValueError(f"Chunk size must be positive: {chunk_size}")
+        # Обычный путь токенизирует весь текст до разбора, поэтому хвост после
+        # корня дочитывается: ошибка токенизации в нем (и перед ней ошибка разбора
+        # не выигрывает) должна проявиться так же
+        tokens = self.stream_tokens(stream, chunk_size)
+        try:
+            result = self.parse_tokens(tokens)
+        except (SyntaxError, NameError):
+            for _ in tokens:
+                pass
+            raise
+        for _ in tokens:
+            pass
+        return result
+
+    @staticmethod
+    def expected(tag: str, token) -> SyntaxError:
+        if token is END_TOKEN:
+            return SyntaxError("Unexpected end of input")
+        return SyntaxError(f"Expected {tag}, got {token[0]}")
+
+    def parse_value(self, token, take):
+        constants = self.constants
+        # Вместо рекурсии по вложенным словарям держим явный стек пар
+        # (незаконченный словарь, ключ, ожидающий значения)
+        stack = []
+        deepest = 0
+
+        while True:
+            tag = token[0]
+            if tag == 'LBRACE':
+                current = {}
+                if len(stack) >= deepest:
+                    deepest = len(stack) + 1
+                token = take()
             else:
-                raise SyntaxError(f"Unexpected token: {token}")
+                current = None
+                if tag == 'NUMBER':
+                    text = token[1]
+                    value = float(text) if '.' in text else int(text)
+                elif tag == 'STRING':
+                    value = token[1][1:-1]
+                elif tag == 'BOOLEAN':
+                    value = token[1] == 'true'
+                elif tag == 'LBRACKET':
+                    token = take()
+                    if token[0] != 'IDENT':
+                        raise self.expected('IDENT', token)
+                    const_name = token[1]
+                    token = take()
+                    if token[0] != 'RBRACKET':
+                        raise self.expected('RBRACKET', token)
+                    if const_name not in constants:
+                        raise NameError(f"Undefined constant: {const_name}")
+                    value = constants[const_name]
+                elif tag == 'IDENT':
+                    const_name = token[1]
+                    if const_name not in constants:
+                        raise SyntaxError(f"Unexpected identifier: {const_name}")
+                    value = constants[const_name]
+                elif tag is None:
+                    value = None
+                else:
+                    raise SyntaxError(f"Unexpected token: {token}")
+                if tag is not None:
+                    token = take()
+
+            while True:
+                if current is not None:
+                    tag = token[0]
+                    if tag is not None and tag != 'RBRACE':
+                        if tag != 'IDENT':
+                            raise self.expected('IDENT', token)
+                        key = token[1]
+                        token = take()
+                        if token[0] != 'ARROW':
+                            raise self.expected('ARROW', token)
+                        stack.append((current, key))
+                        token = take()
+                        break
+                    if tag != 'RBRACE':
+                        raise self.expected('RBRACE', token)
+                    value = current
+                    token = take()
+
+                if not stack:
+                    if deepest > self.stats['max_depth']:
+                        self.stats['max_depth'] = deepest
+                    return value, token
+
+                current, key = stack.pop()
+                current[key] = value
+                if token[0] != 'DOT':
+                    raise self.expected('DOT', token)
+                token = take()
+
+    def parse_constants(self, take):
+        token = take()
+        while token[0] == 'IDENT':
+            name_token = token
+            token = take()
+            if token[0] != 'ASSIGN':
+                raise self.expected('LBRACE', name_token)
+            value, token = self.parse_value(take(), take)
+            self.constants[name_token[1]] = value
+            if token[0] != 'SEMICOLON':
+                raise self.expected('SEMICOLON', token)
+            token = take()
+        return token
+
+    def parse_tokens(self, tokens: Iterable[Tuple[str, str]]) -> Dict[str, Any]:
+        take = partial(next, iter(tokens), END_TOKEN)
 
-        def parse_dict():
-            consume('LBRACE')
+        # При потоковом чтении время разбора включает чтение и токенизацию
+        started = self.start_phase()
+        token = self.parse_constants(take)
+        self.end_phase('constants', started)
+
+        started = self.start_phase()
+        if token is END_TOKEN:
             result = {}
+        elif token[0] != 'LBRACE':
+            raise self.expected('LBRACE', token)
+        else:
+            result = self.parse_value(token, take)[0]
+        self.end_phase('parse', started)
+        return result
+
+    def scan_dict(self, text: str, pos: int, chunk_size: int = 0):
+        # Идет от позиции после '{' до парной '}', не разбирая содержимое. Если
+        # задан chunk_size, попутно отмечает концы записей верхнего уровня
+        # примерно через каждые chunk_size символов
+        search = self.SKIP_REGEX.search
+        cut_search = self.CUT_REGEX.search
+        target = pos + chunk_size if chunk_size else len(text) + 1
+        cuts = []
+        depth = 1
+
+        while True:
+            match = (cut_search if depth == 1 and pos >= target else search)(text, pos)
+            if match is None:
+                raise SyntaxError("Unexpected end of input")
+            char = match.group()
+            pos = match.end()
+            if char == '"':
+                end = text.find('"', pos)
+                if end >= 0:
+                    pos = end + 1
+            elif char == '#':
+                end = text.find('\n', pos)
+                pos = len(text) if end < 0 else end
+            elif char == '{':
+                depth += 1
+            elif char == '}':
+                depth -= 1
+                if not depth:
+                    return pos, cuts
+            else:
+                cuts.append(pos)
+                target = pos + chunk_size
+
+    def parse_parallel(self, text: str, jobs: int = None, min_chunk: int = PARALLEL_CHUNK) -> Dict[str, Any]:
+        # Пролог с константами разбирается здесь, корневой словарь режется на
+        # куски по границам записей верхнего уровня и разбирается в пуле процессов.
+        # При любой ошибке текст разбирается заново последовательно, чтобы
+        # сообщение было тем же, что и без параллельного режима. jobs=0 - по числу процессоров
+        if jobs is not None and jobs < 0:
+            raise ValueError(f"Number of parse jobs cannot be negative: {jobs}")
+        workers = jobs or os.cpu_count() or 1
+        started = self.start_phase()
+        try:
+            scanner = TextScanner(self, text)
+            token = self.parse_constants(scanner.take)
+            if token[0] != 'LBRACE':
+                raise self.expected('LBRACE', token)
+            body_start = scanner.pos
+            chunk_size = max(min_chunk, (len(text) - body_start) // (workers * 4))
+            end, cuts = self.scan_dict(text, body_start, chunk_size)
+            # Хвост после корня не разбирается, но ошибки токенизации в нем
+            # должны проявиться так же, как при обычном разборе
+            tail = TextScanner(self, text, end)
+            while tail.take() is not END_TOKEN:
+                pass
+        except (SyntaxError, NameError):
+            self.constants.clear()
+            return self.parse(text)
+        self.end_phase('constants', started)
+
+        if not cuts or workers == 1:
+            self.constants.clear()
+            return self.parse(text)
 
-            while peek() and peek()[0] != 'RBRACE':
-                key = consume('IDENT')[1]
-                consume('ARROW')
-                value = parse_value()
-                result[key] = value
-                consume('DOT')
+        started = self.start_phase()
+        # Токены пролога, закрывающей скобки корня и хвоста считаются здесь,
+        # токены записей - в процессах пула
+        self.stats['tokens'] = scanner.count + 1 + tail.count
+        bounds = [body_start] + cuts + [end - 1]
+        chunks = [text[bounds[i]:bounds[i + 1]] for i in range(len(bounds) - 1)]
+        result = {}
+        try:
+            with ProcessPoolExecutor(max_workers=workers, initializer=init_parse_worker,
+                                     initargs=(self.constants,)) as executor:
+                for part, tokens, depth in executor.map(parse_entries, chunks):
+                    result.update(part)
+                    self.stats['tokens'] += tokens
+                    self.stats['max_depth'] = max(self.stats['max_depth'], depth)
+        except (SyntaxError, NameError):
+            self.constants.clear()
+            return self.parse(text)
+        self.end_phase('parse', started)
+        return result
 
-            consume('RBRACE')
+    def select(self, text: str, paths: Iterable[str]) -> Dict[str, Value]:
+        wanted = set(paths)
+        # Промежуточные пути, внутрь которых нужно спускаться
+        prefixes = set()
+        for path in wanted:
+            parts = path.split('.')
+            prefixes.update('.'.join(parts[:i]) for i in range(1, len(parts)))
+
+        scanner = TextScanner(self, text)
+        take = scanner.take
+
+        def pluck(path, value):
+            for name in wanted:
+                if name.startswith(path + '.'):
+                    found = value
+                    for key in name[len(path) + 1:].split('.'):
+                        if not isinstance(found, dict) or key not in found:
+                            break
+                        found = found[key]
+                    else:
+                        result[name] = found
+
+        result = {}
+        token = self.parse_constants(take)
+        if token is END_TOKEN:
             return result
+        if token[0] != 'LBRACE':
+            raise self.expected('LBRACE', token)
 
-        while self.pos < len(tokens):
-            if peek()[0] == 'IDENT' and self.pos + 1 < len(tokens) and tokens[self.pos + 1][0] == 'ASSIGN':
-                name = consume('IDENT')[1]
-                consume('ASSIGN')
-                value = parse_value()
-                self.constants[name] = value
-                consume('SEMICOLON')
+        stack = ['']
+        token = take()
+        while stack:
+            prefix = stack[-1]
+            if token[0] == 'RBRACE':
+                stack.pop()
+                token = take()
+                if stack:
+                    if token[0] != 'DOT':
+                        raise self.expected('DOT', token)
+                    token = take()
+                continue
+
+            if token[0] != 'IDENT':
+                raise self.expected('IDENT', token)
+            path = f"{prefix}.{token[1]}" if prefix else token[1]
+            token = take()
+            if token[0] != 'ARROW':
+                raise self.expected('ARROW', token)
+            token = take()
+
+            if path in wanted or path in prefixes:
+                # Повторный ключ заменяет значение целиком, как и при полном разборе
+                for name in [name for name in result if name == path or name.startswith(path + '.')]:
+                    del result[name]
+                if path not in wanted and token[0] == 'LBRACE':
+                    stack.append(path)
+                    token = take()
+                    continue
+                value, token = self.parse_value(token, take)
+                if path in wanted:
+                    result[path] = value
+                pluck(path, value)
+            elif token[0] == 'LBRACE':
+                scanner.pos = self.scan_dict(text, scanner.pos)[0]
+                token = take()
+            elif token[0] == 'LBRACKET':
+                take()
+                take()
+                token = take()
+            elif token[0] in ('NUMBER', 'STRING', 'BOOLEAN', 'IDENT'):
+                token = take()
             else:
-                break
+                value, token = self.parse_value(token, take)
+
+            if token[0] != 'DOT':
+                raise self.expected('DOT', token)
+            token = take()
 
-        return parse_dict() if self.pos < len(tokens) else {}
+        return result
 
     def to_toml(self, data: Dict[str, Any], prefix: str = "") -> str:
-        lines = []
-        for key, value in data.items():
+        buffer = io.StringIO()
+        self.write_toml(data, buffer, prefix)
+        return buffer.getvalue()[:-1]
+
+    def write_toml(self, data: Dict[str, Any], stream=None, prefix: str = ""):
+        if stream is None:
+            stream = sys.stdout
+
+        started = self.start_phase()
+        parts = []
+        append = parts.append
+        # Таблицы обходятся явным стеком итераторов, строки пишутся в поток
+        # порциями, поэтому вложенные результаты не склеиваются повторно
+        stack = [(iter(data.items()), prefix)]
+        first = True
+        blank = False
+
+        while stack:
+            items, prefix = stack[-1]
+            for key, value in items:
+                # Первый элемент уровня идет без разделителя, а после пустой
+                # таблицы перед следующим элементом остается пустая строка
+                separator = '' if first else '\n\n' if blank else '\n'
+                first = False
+                blank = False
+
+                if isinstance(value, dict):
+                    new_prefix = f"{prefix}.{key}" if prefix else key
+                    append(f"{separator}\n[{new_prefix}]" if separator else f"[{new_prefix}]")
+                    if value:
+                        append('\n')
+                        stack.append((iter(value.items()), new_prefix))
+                        first = True
+                        break
+                    blank = True
+                elif isinstance(value, str):
+                    escaped = value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+                    append(f'{separator}{key} = "{escaped}"')
+                elif isinstance(value, bool):
+                    append(f'{separator}{key} = {str(value).lower()}')
+                else:
+                    append(f'{separator}{key} = {value}')
+
+                if len(parts) >= WRITE_BATCH:
+                    stream.write(''.join(parts))
+                    parts.clear()
+            else:
+                stack.pop()
+                blank = False
+
+        append('\n')
+        stream.write(''.join(parts))
+        self.end_phase('emit', started)
+
+
+parse_worker_constants: Dict[str, Value] = {}
+
+
+def init_parse_worker(constants: Dict[str, Value]):
+    global parse_worker_constants
+    parse_worker_constants = constants
+
+
+def parse_entries(text: str):
+    # Кусок корневого словаря - последовательность записей без скобок
+    config_parser = ConfigParser()
+    config_parser.constants = parse_worker_constants
+    tokens = config_parser.tokenize(text)
+    take = partial(next, chain(tokens, [('RBRACE', '}')]), END_TOKEN)
+    result, token = config_parser.parse_value(('LBRACE', '{'), take)
+    if token is not END_TOKEN:
+        raise config_parser.expected('DOT', token)
+    return result, len(tokens), config_parser.stats['max_depth']
+
+
+class CompileCache:
+    def __init__(self, directory: str = CACHE_DIR, limit: int = CACHE_LIMIT):
+        self.directory = directory
+        self.limit = limit
+
+    @staticmethod
+    def key_for(path: str) -> str:
+        # Ключ зависит от содержимого файла и версии инструмента: смена формата
+        # вывода требует увеличить VERSION, чтобы старые записи не использовались
+        digest = hashlib.sha256(VERSION.encode() + b'\0')
+        with open(path, 'rb') as f:
+            for block in iter(partial(f.read, CHUNK_SIZE), b''):
+                digest.update(block)
+        return digest.hexdigest()
+
+    def entry_path(self, key: str) -> str:
+        return os.path.join(self.directory, key + '.toml')
+
+    def load(self, key: str, output) -> bool:
+        path = self.entry_path(key)
+        # Любая ошибка открытия (нет записи, на ее месте каталог, нет прав)
+        # считается промахом; ошибки записи в вывод не скрываются
+        try:
+            f = open(path, 'r', encoding='utf-8')
+        except OSError:
+            return False
+        with f:
+            # Время изменения служит меткой последнего использования для LRU
+            try:
+                os.utime(path)
+            except OSError:
+                pass
+            shutil.copyfileobj(f, output)
+        return True
+
+    def store(self, key: str, render, output):
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        except OSError:
+            render(output)
+            return
+
+        # Запись идет во временный файл и публикуется атомарной заменой, поэтому
+        # параллельные процессы видят либо готовую запись, либо ее отсутствие.
+        # Файл закрывается до замены и удаления: в Windows открытый файл
+        # нельзя ни переименовать, ни удалить
+        # Кэш необязателен: если запись не удалось опубликовать (нет места,
+        # замена открытого файла в Windows, каталог на месте записи), результат
+        # строится прямо в вывод
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                render(f)
+            os.replace(temp_path, self.entry_path(key))
+        except BaseException as e:
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+            if not isinstance(e, OSError):
+                raise
+            render(output)
+            return
+
+        # Опубликованная запись копируется в вывод; если ее успел вытеснить
+        # другой процесс, результат строится заново
+        if not self.load(key, output):
+            render(output)
+
+        try:
+            self.evict()
+        except OSError:
+            pass
+
+    def evict(self):
+        entries = []
+        total = 0
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if not entry.name.endswith('.toml'):
+                    continue
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+
+        if total <= self.limit:
+            return
+
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.limit:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total -= size
+
+
+# Бинарный образ: заголовок, отсортированная по ключу таблица записей
+# фиксированного размера, область ключей (пути через точку) и область значений
+BINARY_MAGIC = b'HWCB'
+BINARY_FORMAT = 1
+BINARY_HEADER = struct.Struct('<4sHHIQQ')
+BINARY_RECORD = struct.Struct('<QIQIIB3x')
+
+TYPE_TABLE, TYPE_INT, TYPE_BIGINT, TYPE_FLOAT, TYPE_BOOL, TYPE_STRING = range(6)
+
+MISSING = object()
+
+
+def pack_value(value: Value):
+    if isinstance(value, dict):
+        return TYPE_TABLE, b''
+    if isinstance(value, bool):
+        return TYPE_BOOL, b'\x01' if value else b'\x00'
+    if isinstance(value, int):
+        if -2 ** 63 <= value < 2 ** 63:
+            return TYPE_INT, struct.pack('<q', value)
+        return TYPE_BIGINT, str(value).encode()
+    if isinstance(value, float):
+        return TYPE_FLOAT, struct.pack('<d', value)
+    return TYPE_STRING, value.encode('utf-8')
+
+
+def unpack_value(kind: int, payload) -> Value:
+    if kind == TYPE_INT:
+        return struct.unpack('<q', payload)[0]
+    if kind == TYPE_FLOAT:
+        return struct.unpack('<d', payload)[0]
+    if kind == TYPE_BOOL:
+        return payload != b'\x00'
+    if kind == TYPE_BIGINT:
+        return int(bytes(payload))
+    if kind == TYPE_STRING:
+        return bytes(payload).decode('utf-8')
+    return {}
+
+
+def compile_binary(data: Dict[str, Any], output):
+    entries = []
+    # Порядковый номер записи в обходе сохраняет исходный порядок ключей
+    # для восстановления таблиц при чтении
+    stack = [(iter(data.items()), '')]
+    while stack:
+        items, prefix = stack[-1]
+        for key, value in items:
+            path = f"{prefix}.{key}" if prefix else key
+            kind, payload = pack_value(value)
+            entries.append((path.encode('utf-8'), kind, payload, len(entries)))
+            if kind == TYPE_TABLE and value:
+                stack.append((iter(value.items()), path))
+                break
+        else:
+            stack.pop()
+
+    entries.sort()
+
+    records = []
+    keys = []
+    values = []
+    key_offset = 0
+    value_offset = 0
+    for path, kind, payload, order in entries:
+        records.append(BINARY_RECORD.pack(key_offset, len(path), value_offset, len(payload), order, kind))
+        keys.append(path)
+        values.append(payload)
+        key_offset += len(path)
+        value_offset += len(payload)
+
+    keys_start = BINARY_HEADER.size + BINARY_RECORD.size * len(entries)
+    values_start = keys_start + key_offset
+    output.write(BINARY_HEADER.pack(BINARY_MAGIC, BINARY_FORMAT, 0, len(entries), keys_start, values_start))
+    output.write(b''.join(records))
+    output.write(b''.join(keys))
+    output.write(b''.join(values))
+
+
+def write_binary(data: Dict[str, Any], path: str):
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(temp_path, 'wb') as f:
+            compile_binary(data, f)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+class CompiledConfig:
+    # Читает образ через mmap: поиск ключа - двоичный поиск по таблице записей,
+    # дерево целиком не строится
+    def __init__(self, path: str):
+        with open(path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            if size < BINARY_HEADER.size:
+                raise ValueError(f"Not a compiled config: {path}")
+            self.image = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, _, self.count, self.keys_start, self.values_start = BINARY_HEADER.unpack_from(self.image)
+        if magic != BINARY_MAGIC or version != BINARY_FORMAT:
+            self.image.close()
+            raise ValueError(f"Not a compiled config: {path}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self.image.close()
+
+    def __len__(self):
+        return self.count
+
+    def record(self, index: int):
+        return BINARY_RECORD.unpack_from(self.image, BINARY_HEADER.size + index * BINARY_RECORD.size)
+
+    def key(self, index: int) -> bytes:
+        key_offset, key_len = self.record(index)[:2]
+        start = self.keys_start + key_offset
+        return self.image[start:start + key_len]
+
+    def value(self, index: int) -> Value:
+        _, _, value_offset, value_len, _, kind = self.record(index)
+        start = self.values_start + value_offset
+        return unpack_value(kind, self.image[start:start + value_len])
+
+    def find(self, path: bytes) -> int:
+        index = bisect.bisect_left(range(self.count), path, key=self.key)
+        return index if index < self.count and self.key(index) == path else -1
+
+    def get(self, path: str, default=MISSING) -> Value:
+        encoded = path.encode('utf-8')
+        index = self.find(encoded)
+        if index < 0:
+            if default is MISSING:
+                raise KeyError(path)
+            return default
+        if self.record(index)[5] != TYPE_TABLE:
+            return self.value(index)
+        return self.table(index, encoded + b'.')
+
+    def __contains__(self, path: str) -> bool:
+        return self.find(path.encode('utf-8')) >= 0
+
+    def __getitem__(self, path: str) -> Value:
+        return self.get(path)
+
+    def table(self, index: int, prefix: bytes) -> Dict[str, Any]:
+        # Потомки таблицы образуют непрерывный диапазон отсортированных ключей
+        end = bisect.bisect_left(range(index + 1, self.count), prefix + b'\xff', key=self.key) + index + 1
+        descendants = sorted(range(index + 1, end), key=lambda i: self.record(i)[4])
+        result = {}
+        tables = {b'': result}
+        for i in descendants:
+            path = self.key(i)[len(prefix):]
+            parent, _, name = path.rpartition(b'.')
+            value = self.value(i)
+            tables[parent][name.decode('utf-8')] = value
             if isinstance(value, dict):
-                new_prefix = f"{prefix}.{key}" if prefix else key
-                lines.append(f"\n[{new_prefix}]")
-                lines.append(self.to_toml(value, new_prefix))
-            elif isinstance(value, str):
-                escaped = value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
-                lines.append(f'{key} = "{escaped}"')
-            elif isinstance(value, bool):
-                lines.append(f'{key} = {str(value).lower()}')
+                tables[path] = value
+        return result
+
+
+def load_config(input_file: str, stream: bool = False, chunk_size: int = CHUNK_SIZE, parse_jobs: int = None):
+    config_parser = ConfigParser()
+
+    with open(input_file, 'r', encoding='utf-8') as f:
+        if stream:
+            data = config_parser.parse_stream(f, chunk_size)
+        else:
+            started = config_parser.start_phase()
+            text = f.read()
+            config_parser.end_phase('read', started)
+            if parse_jobs is not None:
+                data = config_parser.parse_parallel(text, parse_jobs)
+            else:
+                data = config_parser.parse(text)
+
+    return config_parser, data
+
+
+def convert(input_file: str, output=None, stream: bool = False, chunk_size: int = CHUNK_SIZE,
+            cache: CompileCache = None, parse_jobs: int = None):
+    if output is None:
+        output = sys.stdout
+
+    if cache is not None:
+        key = cache.key_for(input_file)
+        if cache.load(key, output):
+            return None
+
+    config_parser, data = load_config(input_file, stream, chunk_size, parse_jobs)
+
+    if cache is not None:
+        cache.store(key, partial(config_parser.write_toml, data), output)
+    else:
+        config_parser.write_toml(data, output)
+    return config_parser
+
+
+def print_stats(config_parser, file=None):
+    if file is None:
+        file = sys.stderr
+
+    if config_parser is None:
+        print("Stats: cache hit, tokenizing and parsing skipped", file=file)
+    else:
+        stats = config_parser.stats
+        print("Stats:", file=file)
+        for name, phase in stats['phases'].items():
+            line = f"  {name:<10}{phase['seconds'] * 1000:10.2f} ms"
+            if 'peak_bytes' in phase:
+                line += f"  peak {phase['peak_bytes'] / 1024:.0f} KiB"
+            print(line, file=file)
+        print(f"  tokens: {stats['tokens']}", file=file)
+        print(f"  constants: {len(config_parser.constants)}", file=file)
+        print(f"  max depth: {stats['max_depth']}", file=file)
+
+    if tracemalloc.is_tracing():
+        # Пик сбрасывается на границе каждой фазы, общий пик - наибольший из них
+        peaks = [tracemalloc.get_traced_memory()[1]]
+        if config_parser is not None:
+            peaks.extend(phase.get('peak_bytes', 0) for phase in config_parser.stats['phases'].values())
+        print(f"  peak memory: {max(peaks) / 1024:.0f} KiB", file=file)
+
+
+def describe_error(error: Exception, input_file: str) -> str:
+    if isinstance(error, FileNotFoundError):
+        return f"Error: File not found: {input_file}"
+    if isinstance(error, SyntaxError):
+        return f"Syntax error: {error}"
+    if isinstance(error, NameError):
+        return f"Name error: {error}"
+    return f"Error: {error}"
+
+
+def expand_inputs(patterns):
+    files = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            matches = sorted(glob.glob(os.path.join(pattern, '**', '*.conf'), recursive=True))
+        elif glob.has_magic(pattern):
+            matches = sorted(glob.glob(pattern, recursive=True))
+        else:
+            matches = [pattern]
+        files.extend(matches)
+    return list(dict.fromkeys(files))
+
+
+def output_path(input_file: str) -> str:
+    return os.path.splitext(input_file)[0] + '.toml'
+
+
+def convert_to_file(input_file: str, stream: bool = False, chunk_size: int = CHUNK_SIZE,
+                    cache: CompileCache = None):
+    # Выполняется в рабочем процессе: ошибка возвращается строкой, чтобы один
+    # неверный файл не прерывал обработку остальных
+    target = output_path(input_file)
+    try:
+        temp_path = f"{target}.{os.getpid()}.tmp"
+        try:
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                convert(input_file, f, stream, chunk_size, cache)
+            os.replace(temp_path, target)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+    except Exception as e:
+        return input_file, describe_error(e, input_file)
+    return input_file, None
+
+
+def convert_batch(input_files, jobs: int = None, stream: bool = False, chunk_size: int = CHUNK_SIZE,
+                  cache: CompileCache = None):
+    if jobs is not None and jobs < 1:
+        raise ValueError(f"Number of jobs must be positive: {jobs}")
+    task = partial(convert_to_file, stream=stream, chunk_size=chunk_size, cache=cache)
+    workers = jobs if jobs is not None else os.cpu_count() or 1
+    if workers == 1 or len(input_files) <= 1:
+        return dict(map(task, input_files))
+
+    # Мелкие файлы раздаются пачками, чтобы не платить за пересылку каждого
+    batch_size = max(1, len(input_files) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return dict(executor.map(task, input_files, chunksize=batch_size))
+
+
+def snapshot(input_files):
+    state = {}
+    for name in input_files:
+        try:
+            stat = os.stat(name)
+        except OSError:
+            continue
+        state[name] = (stat.st_mtime_ns, stat.st_size)
+    return state
+
+
+def watch(patterns, interval: float = WATCH_INTERVAL, stream: bool = False, chunk_size: int = CHUNK_SIZE,
+          cache: CompileCache = None):
+    # Опрос mtime в одном процессе: интерпретатор и скомпилированные выражения
+    # остаются прогретыми, пересобираются только изменившиеся файлы
+    known = {}
+    while True:
+        current = snapshot(expand_inputs(patterns))
+        for name, stamp in current.items():
+            if known.get(name) == stamp:
+                continue
+            started = time.perf_counter()
+            _, error = convert_to_file(name, stream, chunk_size, cache)
+            elapsed = (time.perf_counter() - started) * 1000
+            if error:
+                print(f"{name}: {error} ({elapsed:.1f} ms)", file=sys.stderr)
             else:
-                lines.append(f'{key} = {value}')
-        return '\n'.join(lines).strip()
+                print(f"{name} -> {output_path(name)} ({elapsed:.1f} ms)", file=sys.stderr)
+        known = current
+        time.sleep(interval)
 
 
 def main():
@@ -143,32 +1029,140 @@ def main():
     )
     parser.add_argument(
         'input_file',
-        help='Path to input configuration file'
+        nargs='+',
+        help='Path to input configuration file (with --batch: files, directories or glob patterns)'
+    )
+    parser.add_argument(
+        '--batch',
+        action='store_true',
+        help='Convert every input to a .toml file next to it instead of printing to stdout'
+    )
+    parser.add_argument(
+        '-j', '--jobs',
+        type=int,
+        default=None,
+        help='Number of worker processes for --batch mode, at least 1 (default: number of CPUs)'
+    )
+    parser.add_argument(
+        '--watch',
+        action='store_true',
+        help='Keep running and reconvert inputs to .toml files whenever they change'
+    )
+    parser.add_argument(
+        '--interval',
+        type=float,
+        default=WATCH_INTERVAL,
+        help='Polling interval in seconds for --watch mode'
+    )
+    parser.add_argument(
+        '--stream',
+        action='store_true',
+        help='Read and tokenize the input in chunks instead of loading it whole'
+    )
+    parser.add_argument(
+        '--chunk-size',
+        type=int,
+        default=CHUNK_SIZE,
+        help='Chunk size in characters for --stream mode'
+    )
+    parser.add_argument(
+        '--binary',
+        metavar='FILE',
+        help='Write an indexed binary image of the config to FILE instead of printing TOML'
+    )
+    parser.add_argument(
+        '--stats',
+        action='store_true',
+        help='Print per-phase timings, token and constant counts, depth and peak memory to stderr'
+    )
+    parser.add_argument(
+        '--profile',
+        metavar='FILE',
+        help='Write a cProfile dump of the conversion to FILE'
+    )
+    parser.add_argument(
+        '--parse-jobs',
+        type=int,
+        metavar='N',
+        help='Parse entries of the root dictionary in N worker processes (0: number of CPUs, ignored with --stream)'
+    )
+    parser.add_argument(
+        '--no-cache',
+        action='store_true',
+        help='Do not read or update the compile cache'
+    )
+    parser.add_argument(
+        '--cache-dir',
+        default=CACHE_DIR,
+        help='Directory of the compile cache'
+    )
+    parser.add_argument(
+        '--cache-size',
+        type=int,
+        default=CACHE_LIMIT,
+        help='Maximum total size of the compile cache in bytes'
     )
 
     args = parser.parse_args()
 
-    try:
-        with open(args.input_file, 'r', encoding='utf-8') as f:
-            text = f.read()
+    if not (args.batch or args.watch) and len(args.input_file) > 1:
+        parser.error('multiple inputs require --batch or --watch')
+    if (args.batch or args.watch) and (args.stats or args.profile or args.binary):
+        parser.error('--stats, --profile and --binary apply to a single-file conversion')
+    if args.chunk_size < 1:
+        parser.error('--chunk-size must be positive')
+    if args.jobs is not None and args.jobs < 1:
+        parser.error('--jobs must be at least 1')
+    if args.parse_jobs is not None and args.parse_jobs < 0:
+        parser.error('--parse-jobs cannot be negative')
 
-        config_parser = ConfigParser()
-        data = config_parser.parse(text)
-        toml_output = config_parser.to_toml(data)
+    cache = None if args.no_cache else CompileCache(args.cache_dir, args.cache_size)
 
-        print(toml_output)
+    if args.watch:
+        try:
+            watch(args.input_file, args.interval, args.stream, args.chunk_size, cache)
+        except KeyboardInterrupt:
+            pass
+        return
 
-    except FileNotFoundError:
-        print(f"Error: File not found: {args.input_file}", file=sys.stderr)
-        sys.exit(1)
-    except SyntaxError as e:
-        print(f"Syntax error: {e}", file=sys.stderr)
-        sys.exit(1)
-    except NameError as e:
-        print(f"Name error: {e}", file=sys.stderr)
-        sys.exit(1)
+    if args.batch:
+        try:
+            input_files = expand_inputs(args.input_file)
+            results = convert_batch(input_files, args.jobs, args.stream, args.chunk_size, cache)
+        except Exception as e:
+            print(f"Batch conversion failed: {e}", file=sys.stderr)
+            sys.exit(1)
+        failed = [(name, error) for name, error in results.items() if error]
+        for name, error in failed:
+            print(f"{name}: {error}", file=sys.stderr)
+        print(f"Converted {len(results) - len(failed)} of {len(results)} files", file=sys.stderr)
+        if failed or not results:
+            sys.exit(1)
+        return
+
+    input_file = args.input_file[0]
+    profiler = cProfile.Profile() if args.profile else None
+    if args.stats:
+        tracemalloc.start()
+
+    try:
+        if profiler is not None:
+            profiler.enable()
+        try:
+            if args.binary:
+                config_parser, data = load_config(input_file, args.stream, args.chunk_size, args.parse_jobs)
+                write_binary(data, args.binary)
+            else:
+                config_parser = convert(input_file, sys.stdout, args.stream, args.chunk_size, cache, args.parse_jobs)
+        finally:
+            if profiler is not None:
+                profiler.disable()
+                profiler.dump_stats(args.profile)
+        if args.stats:
+            sys.stdout.flush()
+            print_stats(config_parser)
     except Exception as e:
-        print(f"Error: {e}", file=sys.stderr)
+        print(describe_error(e, input_file), file=sys.stderr)
         sys.exit(1)
 
 
@@ -0,0 +1,287 @@
+import io
+import re
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import tracemalloc
+
+from Homework import ConfigParser, VERSION
+
+DEFAULT_MIX = 'number=4,string=3,bool=1,const=1,dict=1'
+
+VALUE_KINDS = ('number', 'string', 'bool', 'const', 'dict')
+
+
+LEGACY_PATTERNS = [
+    (r'\d+(?:\.\d*)?|\.\d+', 'NUMBER'),
+    (r'"[^"]*"', 'STRING'),
+    (r'\{', 'LBRACE'),
+    (r'\}', 'RBRACE'),
+    (r'->', 'ARROW'),
+    (r'<-', 'ASSIGN'),
+    (r'\[', 'LBRACKET'),
+    (r'\]', 'RBRACKET'),
+    (r'\.', 'DOT'),
+    (r';', 'SEMICOLON'),
+    (r'true|false', 'BOOLEAN'),
+    (r'[_a-zA-Z]+', 'IDENT'),
+    (r'#.*', 'COMMENT'),
+    (r'\s+', 'SPACE'),
+]
+
+
+def legacy_tokenize(text: str):
+    # Токенизатор версии 1.0 без изменений: шаблоны перебираются по очереди
+    # в каждой позиции. Эталон для сравнения скорости и результатов
+    tokens = []
+    pos = 0
+
+    while pos < len(text):
+        match = None
+        for pattern, tag in LEGACY_PATTERNS:
+            regex = re.compile(pattern)
+            match = regex.match(text, pos)
+            if match:
+                if tag != 'SPACE' and tag != 'COMMENT':
+                    tokens.append((tag, match.group()))
+                pos = match.end()
+                break
+        if not match:
+            raise SyntaxError(f"Unexpected char at {pos}: {text[pos]}")
+
+    return tokens
+
+
+def parse_mix(text: str):
+    weights = dict.fromkeys(VALUE_KINDS, 0)
+    for item in text.split(','):
+        kind, _, weight = item.partition('=')
+        kind = kind.strip()
+        if kind not in weights:
+            raise ValueError(f"Unknown value kind in mix: {kind}")
+        weights[kind] = float(weight)
+    return weights
+
+
+def make_name(prefix: str, index: int) -> str:
+    # Имена в языке состоят только из букв и '_', поэтому номер кодируется буквами;
+    # префикс не дает имени начаться с true/false
+    letters = []
+    while True:
+        index, rest = divmod(index, 26)
+        letters.append(chr(ord('a') + rest))
+        if not index:
+            break
+    return prefix + ''.join(reversed(letters))
+
+
+def generate_config(output, width: int = 1000, depth: int = 3, fanout: int = 4, constants: int = 10,
+                    mix: str = DEFAULT_MIX, seed: int = 0):
+    rng = random.Random(seed)
+    weights = parse_mix(mix)
+    const_names = [make_name('c', i) for i in range(constants)]
+    if not const_names:
+        weights['const'] = 0
+
+    kinds = list(VALUE_KINDS)
+    leaf_weights = [0 if kind == 'dict' else weights[kind] for kind in kinds]
+    all_weights = [weights[kind] for kind in kinds]
+
+    def scalar(kind):
+        if kind == 'number':
+            return str(rng.randint(0, 100000)) if rng.random() < 0.7 else f"{rng.random() * 1000:.3f}"
+        if kind == 'string':
+            return '"' + ''.join(rng.choice('abcdefghij klmnop') for _ in range(rng.randint(0, 24))) + '"'
+        if kind == 'bool':
+            return rng.choice(('true', 'false'))
+        return f"[{rng.choice(const_names)}]"
+
+    for name in const_names:
+        kind = rng.choices(kinds, leaf_weights)[0]
+        if kind == 'const':
+            kind = 'number'
+        output.write(f"{name} <- {scalar(kind)};\n")
+
+    # Словари генерируются явным стеком: (осталось записей, уровень вложенности)
+    output.write('{\n')
+    stack = [[width, 1]]
+    while stack:
+        frame = stack[-1]
+        remaining, level = frame
+        indent = '    ' * level
+        if not remaining:
+            stack.pop()
+            output.write('    ' * (level - 1) + ('}.\n' if stack else '}\n'))
+            continue
+        frame[0] -= 1
+        key = make_name('k', frame[0])
+        kind = rng.choices(kinds, all_weights if level <= depth else leaf_weights)[0]
+        if kind == 'dict':
+            output.write(f"{indent}{key} -> {{\n")
+            stack.append([fanout, level + 1])
+        else:
+            output.write(f"{indent}{key} -> {scalar(kind)} .\n")
+
+
+def measure(phase, repeat: int):
+    best = None
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = phase()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+
+    tracemalloc.start()
+    phase()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return best, peak, result
+
+
+def run_benchmark(text: str, repeat: int = 3, legacy: bool = False):
+    tokens = ConfigParser().tokenize(text)
+    data = ConfigParser().parse_tokens(tokens)
+
+    tokenize_time, tokenize_peak, _ = measure(lambda: ConfigParser().tokenize(text), repeat)
+    parse_time, parse_peak, _ = measure(lambda: ConfigParser().parse_tokens(tokens), repeat)
+    emit_time, emit_peak, _ = measure(lambda: ConfigParser().write_toml(data, io.StringIO()), repeat)
+    stream_time, stream_peak, _ = measure(lambda: ConfigParser().parse_stream(io.StringIO(text)), repeat)
+
+    report = {
+        'version': VERSION,
+        'python': platform.python_version(),
+        'input_chars': len(text),
+        'tokens': len(tokens),
+        'phases': {
+            'tokenize': {
+                'seconds': tokenize_time,
+                'tokens_per_sec': len(tokens) / tokenize_time if tokenize_time else None,
+                'peak_bytes': tokenize_peak,
+            },
+            'parse': {
+                'seconds': parse_time,
+                'tokens_per_sec': len(tokens) / parse_time if parse_time else None,
+                'peak_bytes': parse_peak,
+            },
+            'emit': {
+                'seconds': emit_time,
+                'peak_bytes': emit_peak,
+            },
+            'stream_parse': {
+                'seconds': stream_time,
+                'tokens_per_sec': len(tokens) / stream_time if stream_time else None,
+                'peak_bytes': stream_peak,
+            },
+        },
+    }
+
+    if legacy:
+        # Старый токенизатор на том же тексте; его токены должны совпасть с новыми
+        legacy_time, legacy_peak, legacy_tokens = measure(lambda: legacy_tokenize(text), repeat)
+        if legacy_tokens != list(tokens):
+            raise AssertionError("Legacy and current tokenizers disagree on the input")
+        report['phases']['legacy_tokenize'] = {
+            'seconds': legacy_time,
+            'tokens_per_sec': len(tokens) / legacy_time if legacy_time else None,
+            'peak_bytes': legacy_peak,
+        }
+        report['tokenize_speedup'] = legacy_time / tokenize_time if tokenize_time else None
+
+    return report
+
+
+# Параметры, от которых зависит сгенерированный или прочитанный вход
+INPUT_PARAMS = ('input_file', 'width', 'depth', 'fanout', 'constants', 'mix', 'seed')
+
+
+def input_differences(report, baseline):
+    differences = []
+    for key in ('input_chars', 'tokens'):
+        if report.get(key) != baseline.get(key):
+            differences.append(f"{key} {baseline.get(key)} -> {report.get(key)}")
+    params, baseline_params = report.get('params') or {}, baseline.get('params') or {}
+    for key in INPUT_PARAMS:
+        if params.get(key) != baseline_params.get(key):
+            differences.append(f"{key} {baseline_params.get(key)} -> {params.get(key)}")
+    return differences
+
+
+def print_report(report, baseline=None, file=sys.stdout):
+    print(f"Version {report['version']}, Python {report['python']}: "
+          f"{report['input_chars']} chars, {report['tokens']} tokens", file=file)
+    if baseline:
+        # Время сравнивается в пересчете на токен: абсолютные секунды на разных
+        # входах несравнимы, а разный вход все равно делает сравнение приблизительным
+        differences = input_differences(report, baseline)
+        if differences:
+            print(f"  Warning: the baseline was measured on a different input ({', '.join(differences)}); "
+                  f"ratios are per token", file=file)
+    for name, phase in report['phases'].items():
+        line = f"  {name:<16}{phase['seconds'] * 1000:10.1f} ms  {phase['peak_bytes'] / 1024:10.0f} KiB"
+        if phase.get('tokens_per_sec'):
+            line += f"  {phase['tokens_per_sec']:12.0f} tok/s"
+        if baseline and name in baseline['phases'] and report['tokens'] and baseline.get('tokens'):
+            before = baseline['phases'][name]['seconds'] / baseline['tokens']
+            if before:
+                line += f"  ({phase['seconds'] / report['tokens'] / before:.2f}x of {baseline['version']})"
+        print(line, file=file)
+    if report.get('tokenize_speedup'):
+        print(f"  tokenize is {report['tokenize_speedup']:.1f}x faster than the legacy tokenizer", file=file)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark ConfigParser on synthetic or existing configs')
+    parser.add_argument('input_file', nargs='?', help='Benchmark this file instead of a generated config')
+    parser.add_argument('--generate', action='store_true', help='Only print the generated config to stdout')
+    parser.add_argument('--width', type=int, default=10000, help='Entries in the root dictionary')
+    parser.add_argument('--depth', type=int, default=3, help='Maximum nesting depth of dictionary values')
+    parser.add_argument('--fanout', type=int, default=4, help='Entries in each nested dictionary')
+    parser.add_argument('--constants', type=int, default=10, help='Number of declared constants')
+    parser.add_argument('--mix', default=DEFAULT_MIX, help='Value kind weights, e.g. number=4,string=3,dict=1')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=3, help='Timed runs per phase, the best one is reported')
+    parser.add_argument('--legacy', action='store_true',
+                        help='Also time the original per-pattern tokenizer and check it yields the same tokens')
+    parser.add_argument('--json', help='Save the results to this JSON file')
+    parser.add_argument('--compare', help='Compare with results previously saved by --json')
+
+    args = parser.parse_args()
+
+    try:
+        if args.generate:
+            generate_config(sys.stdout, args.width, args.depth, args.fanout, args.constants, args.mix, args.seed)
+            return
+
+        if args.input_file:
+            with open(args.input_file, 'r', encoding='utf-8') as f:
+                text = f.read()
+        else:
+            buffer = io.StringIO()
+            generate_config(buffer, args.width, args.depth, args.fanout, args.constants, args.mix, args.seed)
+            text = buffer.getvalue()
+
+        report = run_benchmark(text, args.repeat, args.legacy)
+        report['params'] = {key: value for key, value in vars(args).items() if key not in ('json', 'compare')}
+
+        baseline = None
+        if args.compare:
+            with open(args.compare, 'r', encoding='utf-8') as f:
+                baseline = json.load(f)
+
+        print_report(report, baseline)
+
+        if args.json:
+            with open(args.json, 'w', encoding='utf-8') as f:
+                json.dump(report, f, indent=2)
+
+    except Exception as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
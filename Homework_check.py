@@ -0,0 +1,108 @@
+import io
+import re
+import sys
+import random
+import argparse
+
+from Homework import ConfigParser
+from Homework_bench import legacy_tokenize, generate_config
+
+# Фрагменты, из которых собираются случайные входы: все виды токенов, их
+# обрывки, пробелы, комментарии и символы, которых нет в языке
+FRAGMENTS = (
+    'a', 'key', '_x', 'true', 'false', 'truex', 'fals', '12', '3.5', '.5', '7.', '0', '"s"', '""', '"a b#c"',
+    '"', '{', '}', '->', '<-', '-', '<', '>', '[', ']', '.', ';', '#c', '#', ' ', '  ', '\n', '\t', '\r\n',
+    '\x0b', ' ', '@', '=', 'é', ' ',
+)
+
+ERROR_OFFSET_REGEX = re.compile(r'Unexpected char at (\d+)')
+
+# Хвосты после корневого словаря: разбор его не читает, но ошибка
+# токенизации в хвосте должна проявиться и при потоковом чтении
+TAILS = ('', '\n', '\n\n\nx y @', ' } {', '\n@\n', ' "open', ' a -> 1 .', '#c\n@')
+
+
+def outcome(tokenize, text: str):
+    # Список токенов или (тип ошибки, смещение ошибочного символа)
+    try:
+        return list(tokenize(text))
+    except SyntaxError as e:
+        match = ERROR_OFFSET_REGEX.match(str(e))
+        return type(e).__name__, int(match.group(1)) if match else str(e)
+
+
+def random_text(rng: random.Random) -> str:
+    return ''.join(rng.choice(FRAGMENTS) for _ in range(rng.randint(0, 40)))
+
+
+def check_text(text: str, rng: random.Random):
+    # Возвращает описание расхождения или None
+    expected = outcome(legacy_tokenize, text)
+    actual = outcome(lambda source: ConfigParser().tokenize(source), text)
+    if actual != expected:
+        return f"tokenize: expected {expected!r}, got {actual!r}"
+
+    chunk_size = rng.randint(1, 8)
+    streamed = outcome(lambda source: ConfigParser().stream_tokens(io.StringIO(source), chunk_size), text)
+    if streamed != expected:
+        return f"stream_tokens(chunk_size={chunk_size}): expected {expected!r}, got {streamed!r}"
+    return None
+
+
+def parse_outcome(parse, text: str):
+    # Результат разбора или (тип ошибки, сообщение)
+    try:
+        return parse(text)
+    except (SyntaxError, NameError) as e:
+        return type(e).__name__, str(e)
+
+
+def check_parse(text: str, rng: random.Random):
+    # Потоковый разбор должен совпадать с обычным и по результату, и по ошибке
+    expected = parse_outcome(lambda source: ConfigParser().parse(source), text)
+    chunk_size = rng.randint(1, 8)
+    streamed = parse_outcome(lambda source: ConfigParser().parse_stream(io.StringIO(source), chunk_size), text)
+    if streamed != expected:
+        return f"parse_stream(chunk_size={chunk_size}): expected {expected!r}, got {streamed!r}"
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Check that the tokenizers produce the same tokens and errors as the original one '
+                    'and that streaming parse matches the regular one')
+    parser.add_argument('--cases', type=int, default=20000, help='Number of random inputs')
+    parser.add_argument('--configs', type=int, default=20, help='Number of generated well-formed configs')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    cases = [random_text(rng) for _ in range(args.cases)]
+    for seed in range(args.configs):
+        buffer = io.StringIO()
+        generate_config(buffer, width=50, seed=args.seed + seed)
+        cases.append(buffer.getvalue())
+    documents = ['{ a -> 1 . }' + tail for tail in TAILS]
+    documents += [case + rng.choice(TAILS) for case in cases[args.cases:]]
+    documents += [random_text(rng) for _ in range(args.cases // 10)]
+
+    for number, text in enumerate(cases):
+        problem = check_text(text, rng)
+        if problem:
+            print(f"Case {number} differs: {text!r}", file=sys.stderr)
+            print(f"  {problem}", file=sys.stderr)
+            sys.exit(1)
+
+    for number, text in enumerate(documents):
+        problem = check_parse(text, rng)
+        if problem:
+            print(f"Document {number} differs: {text!r}", file=sys.stderr)
+            print(f"  {problem}", file=sys.stderr)
+            sys.exit(1)
+
+    print(f"{len(cases)} inputs: tokens and error offsets match the original tokenizer")
+    print(f"{len(documents)} documents: streaming parse matches the regular parse")
+
+
+if __name__ == "__main__":
+    main()